@@ -4,11 +4,24 @@ import os
 import json
 import random
 import math
+import zlib
+import argparse
+import collections
+import contextlib
+import copy
+import difflib
+import functools
+import hashlib
+import inspect
+import io
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-# Create output directory for our assets
+# Default directory for generated assets; it is only created when a DiskSink
+# first writes to it, so importing this module never touches the disk
 output_dir = "comedian_assets"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
 
 # Enhanced color palette (RGBA) with more shades for better detailing
 colors = {
@@ -60,36 +73,293 @@ colors = {
 # Size is now 1.5x larger
 CHAR_SIZE = 96  # Up from 64
 
+# Output scale for high-DPI builds. "nearest" renders at base size and copies
+# every pixel into a scale x scale block; "vector" rasterizes natively at the
+# higher resolution for smooth curves.
+SCALE = 1
+SCALE_MODE = "nearest"
+SCALE_MODES = ("nearest", "vector")
+
+# Base seed for the texture noise; every frame derives its own stream from it
+NOISE_SEED = 42
+
+def frame_rng(animation, frame, seed=NOISE_SEED):
+    """Return the noise generator for one frame of an animation.
+
+    The stream depends only on the seed, the animation name and the frame
+    index, so any single frame can be regenerated exactly on its own.
+    """
+    return np.random.default_rng([seed, zlib.crc32(animation.encode()), frame])
+
+# Named palette variants as overrides of the base colors (mostly the suit)
+PALETTES = {
+    "classic": {},
+    "tuxedo": {
+        "blue": (45, 45, 55, 255),
+        "blue_dark": (25, 25, 32, 255),
+        "blue_light": (75, 75, 90, 255),
+        "blue_highlight": (100, 100, 120, 255),
+    },
+    "vaudeville": {
+        "blue": (150, 40, 140, 255),
+        "blue_dark": (105, 20, 100, 255),
+        "blue_light": (190, 80, 180, 255),
+        "blue_highlight": (215, 120, 205, 255),
+        "red": (255, 215, 0, 255),
+        "red_dark": (200, 160, 0, 255),
+    },
+    "ginger": {
+        "brown": (200, 90, 30, 255),
+        "brown_dark": (150, 60, 15, 255),
+        "brown_light": (230, 120, 50, 255),
+    },
+}
+
+@contextlib.contextmanager
+def use_palette(name):
+    """Temporarily apply one of PALETTES to colors.
+
+    The tile caches are keyed by the palette, so cached parts follow the
+    swap. colors is module state, so callers rendering from several threads
+    must hold a lock around this.
+    """
+    saved = dict(colors)
+    colors.update(PALETTES[name])
+    try:
+        yield
+    finally:
+        colors.clear()
+        colors.update(saved)
+
+# =========================
+# INDEXED COLOUR
+# =========================
+
+# Apart from the texture noise every character pixel is an entry of colors,
+# so frames can be rendered into a 2D uint8 canvas of palette indices (a
+# quarter of the memory of RGBA) and written as palette PNGs with a tRNS
+# chunk. Inside indexed_colors() each colors entry holds its palette index
+# instead of its RGBA value and new canvases are index canvases; the drawing
+# primitives work the same on either kind.
+
+PALETTE_NAMES = tuple(colors)  # Palette index order; "transparent" is index 0
+
+# Index canvases replace noise with dithering: a pixel whose noise exceeds
+# DITHER_STEP moves to the nearest lighter or darker palette colour within
+# SHADE_DISTANCE, so it never leaves the palette.
+DITHER_STEP = 12
+SHADE_DISTANCE = 100
+
+# The RGBA colors while indexed_colors() has swapped them for indices, else None
+_rgba_colors = None
+
+def palette_lut(palette=None, overrides=None):
+    """Return the (N, 4) RGBA lookup table for palette indices.
+
+    palette names a PALETTES variant to apply, and overrides maps colors
+    names to replacement RGBA values on top of it.
+    """
+    table = dict(colors if _rgba_colors is None else _rgba_colors)
+    if palette:
+        table.update(PALETTES[palette])
+    if overrides:
+        table.update(overrides)
+    return np.array([table[name] for name in PALETTE_NAMES], dtype=np.uint8)
+
+@contextlib.contextmanager
+def indexed_colors():
+    """Render into palette-index canvases while the context is active.
+
+    Like use_palette this changes module state, so callers rendering from
+    several threads must hold a lock around it. Nesting is a no-op.
+    """
+    global _rgba_colors
+    if _rgba_colors is not None:
+        yield
+        return
+    _rgba_colors = dict(colors)
+    colors.update({name: index for index, name in enumerate(PALETTE_NAMES)})
+    try:
+        yield
+    finally:
+        colors.clear()
+        colors.update(_rgba_colors)
+        _rgba_colors = None
+
+def render_indexed(renderer, *args):
+    """Call a frame renderer so that it returns a palette-index canvas."""
+    with indexed_colors():
+        return renderer(*args)
+
+def indexed_jobs(jobs):
+    """Turn render jobs into jobs producing palette-index canvases."""
+    return [(filename, render_indexed, (renderer,) + tuple(args)) for filename, renderer, args in jobs]
+
+def to_rgba(canvas, palette=None):
+    """Expand a palette-index canvas to RGBA through the palette; RGBA canvases pass through."""
+    if canvas.ndim == 3:
+        return canvas
+    return palette_lut(palette)[canvas]
+
+def index_canvas(canvas, palette=None):
+    """Map an RGBA canvas drawn only with palette colours back to palette indices."""
+    if canvas.ndim == 2:
+        return canvas
+    lut = palette_lut(palette).view(np.uint32)[:, 0]
+    order = np.argsort(lut)
+    packed = np.ascontiguousarray(canvas).view(np.uint32)[..., 0]
+    indices = order[np.searchsorted(lut[order], packed).clip(max=len(lut) - 1)]
+    if (lut[indices] != packed).any():
+        raise ValueError("canvas has colours outside the palette")
+    return indices.astype(np.uint8)
+
+def shade_steps(lut):
+    """Return the darker and lighter neighbour index of every palette entry.
+
+    A neighbour is the closest opaque palette colour within SHADE_DISTANCE
+    that is darker (or lighter); entries without one map to themselves.
+    """
+    rgb = lut[:, :3].astype(np.int32)
+    luma = rgb @ np.array([299, 587, 114])
+    distance = np.sqrt(((rgb[:, np.newaxis] - rgb[np.newaxis]) ** 2).sum(axis=2))
+    opaque = lut[:, 3] == 255
+    near = (distance < SHADE_DISTANCE) & opaque[np.newaxis, :] & opaque[:, np.newaxis]
+    own = np.arange(len(lut))
+    steps = []
+    for side in (luma[np.newaxis, :] < luma[:, np.newaxis], luma[np.newaxis, :] > luma[:, np.newaxis]):
+        candidates = np.where(near & side, distance, np.inf)
+        steps.append(np.where(np.isfinite(candidates.min(axis=1)), candidates.argmin(axis=1), own))
+    return steps[0].astype(np.uint8), steps[1].astype(np.uint8)
+
 def create_blank_canvas(width, height):
-    """Create a blank transparent canvas."""
+    """Create a blank transparent canvas (a palette-index canvas inside indexed_colors())."""
+    if _rgba_colors is not None:
+        return np.zeros((height, width), dtype=np.uint8)
     return np.zeros((height, width, 4), dtype=np.uint8)
 
-def save_image(img_array, filename):
-    """Save the numpy array as a PNG image."""
-    img = Image.fromarray(img_array)
-    img.save(os.path.join(output_dir, filename))
-    print(f"Saved {filename}")
+# PNG encoding. Level 6 is zlib's (and Pillow's) default trade-off; 1 encodes
+# several times faster for slightly larger files and 9 is smallest but slowest.
+PNG_COMPRESS_LEVEL = 6
+PNG_WRITE_THREADS = min(8, os.cpu_count() or 1)
+
+def quantize_image(img_array):
+    """Convert an RGBA array to a palette ("P") image with per-entry alpha.
+
+    Canvases with at most 256 distinct colours convert losslessly; noisier
+    ones fall back to Pillow's fast octree quantizer, which is lossy.
+    """
+    packed = np.ascontiguousarray(img_array).view(np.uint32)[..., 0]
+    palette, indices = np.unique(packed, return_inverse=True)
+    if len(palette) > 256:
+        return Image.fromarray(img_array).quantize(256, method=Image.Quantize.FASTOCTREE)
+    return palette_image(indices.reshape(packed.shape).astype(np.uint8), palette.view(np.uint8).reshape(-1, 4))
+
+def palette_image(indices, lut):
+    """Build a palette ("P") image from an index canvas and its (N, 4) RGBA lookup table."""
+    img = Image.fromarray(indices)
+    img.putpalette(lut[:, :3].tobytes())
+    img.info["transparency"] = lut[:, 3].tobytes()
+    return img
+
+def encode_png(img_array, compress_level=PNG_COMPRESS_LEVEL, quantize=False, lut=None):
+    """Encode the numpy array as PNG bytes in memory.
+
+    Palette-index canvases are written as palette PNGs, through lut if one
+    is given and the current palette otherwise; RGBA canvases are
+    optionally palette-quantized.
+    """
+    if img_array.ndim == 2:
+        img = palette_image(img_array, palette_lut() if lut is None else lut)
+    elif quantize:
+        img = quantize_image(img_array)
+    else:
+        img = Image.fromarray(img_array)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+def save_image(img_array, filename, directory=None, compress_level=PNG_COMPRESS_LEVEL, quantize=False):
+    """Save the numpy array as a PNG image in directory (output_dir by default).
+
+    Returns the number of bytes written.
+    """
+    data = encode_png(img_array, compress_level, quantize)
+    with open(os.path.join(directory or output_dir, filename), "wb") as f:
+        f.write(data)
+    return len(data)
 
-def draw_pixel(canvas, x, y, color):
+def load_image(filename, directory=None):
+    """Load a previously saved PNG from directory (output_dir by default) as an RGBA array."""
+    with Image.open(os.path.join(directory or output_dir, filename)) as img:
+        return np.array(img.convert("RGBA"))
+
+# Drawing coordinates are always in base (scale 1) pixels. With scale > 1 the
+# primitives rasterize natively at the higher resolution: rectangles grow to
+# exact blocks, while circles, ovals and lines are sampled at the centre of
+# every output pixel so their edges stay smooth instead of blocky.
+
+def draw_pixel(canvas, x, y, color, scale=1):
     """Draw a single pixel on the canvas."""
-    if 0 <= y < canvas.shape[0] and 0 <= x < canvas.shape[1]:
+    if scale != 1:
+        draw_rectangle(canvas, x, y, 1, 1, color, scale)
+    elif 0 <= y < canvas.shape[0] and 0 <= x < canvas.shape[1]:
         canvas[y, x] = color
 
-def draw_rectangle(canvas, x, y, width, height, color):
+def _clip_span(start, length, limit):
+    """Clip the half-open span [start, start + length) to [0, limit)."""
+    return max(start, 0), min(start + length, limit)
+
+def sample_grid(height, width, scale=1):
+    """Return open-grid row and column coordinates, in base pixels, of the output pixel centres.
+
+    A base area of height x width covers (height * scale) x (width * scale)
+    output pixels. At scale 1 the coordinates are exactly 0, 1, 2, ...
+    """
+    rows = (np.arange(height * scale) + 0.5) / scale - 0.5
+    cols = (np.arange(width * scale) + 0.5) / scale - 0.5
+    return rows[:, np.newaxis], cols[np.newaxis, :]
+
+def fill_mask(canvas, x, y, mask, color):
+    """Fill every pixel where mask is True, with the mask's top-left corner at (x, y).
+
+    Coordinates are output pixels. Pixels that fall outside the canvas are
+    skipped, exactly like draw_pixel.
+    """
+    mask_height, mask_width = mask.shape
+    x0, x1 = _clip_span(x, mask_width, canvas.shape[1])
+    y0, y1 = _clip_span(y, mask_height, canvas.shape[0])
+    if x0 < x1 and y0 < y1:
+        canvas[y0:y1, x0:x1][mask[y0 - y:y1 - y, x0 - x:x1 - x]] = color
+
+def draw_rectangle(canvas, x, y, width, height, color, scale=1):
     """Draw a filled rectangle on the canvas."""
-    for i in range(height):
-        for j in range(width):
-            draw_pixel(canvas, x + j, y + i, color)
+    x0, x1 = _clip_span(x * scale, width * scale, canvas.shape[1])
+    y0, y1 = _clip_span(y * scale, height * scale, canvas.shape[0])
+    if x0 < x1 and y0 < y1:
+        canvas[y0:y1, x0:x1] = color
 
-def draw_circle(canvas, center_x, center_y, radius, color):
+def draw_circle(canvas, center_x, center_y, radius, color, scale=1):
     """Draw a filled circle on the canvas."""
-    for y in range(center_y - radius, center_y + radius + 1):
-        for x in range(center_x - radius, center_x + radius + 1):
-            if (x - center_x)**2 + (y - center_y)**2 <= radius**2:
-                draw_pixel(canvas, x, y, color)
+    dy, dx = sample_grid(2 * radius + 1, 2 * radius + 1, scale)
+    fill_mask(canvas, (center_x - radius) * scale, (center_y - radius) * scale,
+              (dx - radius)**2 + (dy - radius)**2 <= radius**2, color)
+
+def draw_ellipse(canvas, center_x, center_y, radius_x, radius_y, color, scale=1):
+    """Draw a filled axis-aligned ellipse on the canvas."""
+    dy, dx = sample_grid(2 * radius_y + 1, 2 * radius_x + 1, scale)
+    fill_mask(canvas, (center_x - radius_x) * scale, (center_y - radius_y) * scale,
+              (dx - radius_x)**2 * radius_y**2 + (dy - radius_y)**2 * radius_x**2 <= (radius_x * radius_y)**2,
+              color)
 
-def draw_line(canvas, x1, y1, x2, y2, color):
-    """Draw a line using Bresenham's algorithm."""
+def draw_line(canvas, x1, y1, x2, y2, color, scale=1):
+    """Draw a line using Bresenham's algorithm.
+
+    At scale > 1 the line is traced between the scaled pixel centres and
+    stamped with a scale-sized square, so it keeps its weight without the
+    staircase of an upscaled one-pixel line.
+    """
+    half = scale // 2
+    x1, y1, x2, y2 = x1 * scale + half, y1 * scale + half, x2 * scale + half, y2 * scale + half
     dx = abs(x2 - x1)
     dy = abs(y2 - y1)
     sx = 1 if x1 < x2 else -1
@@ -97,7 +367,10 @@ def draw_line(canvas, x1, y1, x2, y2, color):
     err = dx - dy
     
     while True:
-        draw_pixel(canvas, x1, y1, color)
+        if scale == 1:
+            draw_pixel(canvas, x1, y1, color)
+        else:
+            draw_rectangle(canvas, x1 - half, y1 - half, scale, scale, color)
         if x1 == x2 and y1 == y2:
             break
         e2 = 2 * err
@@ -108,43 +381,202 @@ def draw_line(canvas, x1, y1, x2, y2, color):
             err += dx
             y1 += sy
 
-def add_noise(canvas, region_x, region_y, width, height, intensity=0.1):
-    """Add subtle noise to a region for texture."""
-    for y in range(region_y, region_y + height):
-        for x in range(region_x, region_x + width):
-            if 0 <= y < canvas.shape[0] and 0 <= x < canvas.shape[1]:
-                pixel = canvas[y, x].copy()
-                # Only add noise if pixel is not transparent
-                if pixel[3] > 0:
-                    # Add noise to RGB channels
-                    for i in range(3):
-                        noise = int(np.random.normal(0, intensity * 255))
-                        pixel[i] = max(0, min(255, pixel[i] + noise))
-                    canvas[y, x] = pixel
-
-def draw_outfit(canvas, x, y, width, height, colors_main, colors_shadow, colors_highlight):
+# Polygons use continuous coordinates in base pixels, where base pixel (x, y)
+# covers the square from (x, y) to (x + 1, y + 1). An output pixel is filled
+# when its centre lies inside, so a polygon on a rectangle's corners fills
+# exactly the pixels draw_rectangle does, at any scale.
+
+AA_SAMPLES = 4  # Sub-rows scanned per output pixel row when anti-aliasing
+
+def scanline_crossings(points, rows):
+    """Return (starts, stops): the x where each run inside a polygon begins and ends on every row.
+
+    All edge crossings of all rows are found in one vectorized step and
+    paired left to right (even-odd rule). Rows with fewer runs are padded
+    with empty (inf, inf) runs.
+    """
+    x0, y0 = points[:, 0], points[:, 1]
+    x1, y1 = x0[np.r_[1:len(points), 0]], y0[np.r_[1:len(points), 0]]
+    y = rows[:, np.newaxis]
+    active = (np.minimum(y0, y1) <= y) & (y < np.maximum(y0, y1))  # Horizontal edges never cross
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossings = np.where(active, x0 + (y - y0) * (x1 - x0) / (y1 - y0), np.inf)
+    if crossings.shape[1] % 2:
+        crossings = np.pad(crossings, ((0, 0), (0, 1)), constant_values=np.inf)
+    crossings.sort(axis=1)
+    return crossings[:, 0::2], crossings[:, 1::2]
+
+def polygon_spans(points, rows, cols):
+    """Scanline a polygon: return (row, start, stop) index arrays of the sample runs inside it.
+
+    rows and cols are increasing 1D arrays of sample y and x coordinates;
+    a sample is inside when start <= its column index < stop on its row.
+    """
+    starts, stops = scanline_crossings(points, rows)
+    starts, stops = np.searchsorted(cols, starts), np.searchsorted(cols, stops)
+    row, pair = np.nonzero(stops > starts)
+    return row, starts[row, pair], stops[row, pair]
+
+def polygon_coverage(points, x0, y0, x1, y1):
+    """Return the fraction of each output pixel in [x0, x1) x [y0, y1) that a polygon covers.
+
+    Each pixel row is scanned at AA_SAMPLES sub-rows; along a sub-row the
+    covered length of every pixel is exact, so the pixels a run crosses
+    completely get 1 and only its two end pixels get fractions.
+    """
+    starts, stops = scanline_crossings(points, (np.arange(y0 * AA_SAMPLES, y1 * AA_SAMPLES) + 0.5) / AA_SAMPLES)
+    row, pair = np.nonzero(stops > starts)
+    start = np.clip(starts[row, pair], x0, x1) - x0
+    stop = np.clip(stops[row, pair], x0, x1) - x0
+    inside = stop > start
+    row, start, stop = row[inside] // AA_SAMPLES, start[inside], stop[inside]
+    
+    width = x1 - x0 + 1  # One spare column for runs ending on the right edge
+    size = (y1 - y0) * width
+    first, last = start.astype(np.intp), stop.astype(np.intp)
+    same = first == last
+    whole = (np.bincount((row * width + first + 1)[~same], minlength=size)
+             - np.bincount((row * width + last)[~same], minlength=size))
+    ends = (np.bincount(row * width + first, np.where(same, stop - start, first + 1 - start), minlength=size)
+            + np.bincount((row * width + last)[~same], (stop - last)[~same], minlength=size))
+    coverage = np.cumsum(whole.reshape(-1, width), axis=1) + ends.reshape(-1, width)
+    return coverage[:, :-1] / AA_SAMPLES
+
+def blend_coverage(region, coverage, color):
+    """Composite color over an RGBA region with per-pixel coverage as extra opacity."""
+    if color[3] == 0:
+        return  # Nothing to composite, and the empty pixels it covers would divide by zero
+    covered = coverage > 0
+    src_alpha = coverage[covered, np.newaxis] * (color[3] / 255)
+    dst = region[covered].astype(np.float64)
+    dst_alpha = dst[:, 3:] / 255
+    out_alpha = src_alpha + dst_alpha * (1 - src_alpha)
+    rgb = (np.asarray(color[:3]) * src_alpha + dst[:, :3] * dst_alpha * (1 - src_alpha)) / out_alpha
+    region[covered] = np.rint(np.concatenate([rgb, out_alpha * 255], axis=1)).astype(np.uint8)
+
+def draw_polygon(canvas, points, color, scale=1, antialias=False):
+    """Fill a polygon given as a sequence of (x, y) vertices in one scanline pass.
+
+    With antialias set, edge pixels are blended by how much of them the
+    polygon covers (see polygon_coverage). Palette-index
+    canvases cannot blend, so they always get the hard-edged fill.
+    """
+    points = np.asarray(points, dtype=np.float64) * scale
+    x0, x1 = max(int(math.floor(points[:, 0].min())), 0), min(int(math.ceil(points[:, 0].max())), canvas.shape[1])
+    y0, y1 = max(int(math.floor(points[:, 1].min())), 0), min(int(math.ceil(points[:, 1].max())), canvas.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    if not antialias or canvas.ndim == 2:
+        # One slice per run of covered pixels, so the cost follows the pixels filled
+        row, start, stop = polygon_spans(points, np.arange(y0, y1) + 0.5, np.arange(x0, x1) + 0.5)
+        color = np.asarray(color, dtype=canvas.dtype)
+        for y, start_x, stop_x in zip((row + y0).tolist(), (start + x0).tolist(), (stop + x0).tolist()):
+            canvas[y, start_x:stop_x] = color
+        return
+    blend_coverage(canvas[y0:y1, x0:x1], polygon_coverage(points, x0, y0, x1, y1), color)
+
+def convex_hull(points):
+    """Return the convex hull of (x, y) points in order (monotone chain)."""
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+    
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+    
+    lower, upper = [], []
+    for point in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+    for point in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+    return lower[:-1] + upper[:-1]
+
+def draw_thick_line(canvas, x1, y1, x2, y2, width, color, scale=1, antialias=False):
+    """Draw a line of the given width between two pixel centres as one polygon, with square caps."""
+    length = math.hypot(x2 - x1, y2 - y1)
+    ux, uy = ((x2 - x1) / length, (y2 - y1) / length) if length else (1.0, 0.0)
+    half = width / 2
+    ax, ay, bx, by = x1 + 0.5 - ux * half, y1 + 0.5 - uy * half, x2 + 0.5 + ux * half, y2 + 0.5 + uy * half
+    nx, ny = -uy * half, ux * half
+    draw_polygon(canvas, [(ax + nx, ay + ny), (bx + nx, by + ny), (bx - nx, by - ny), (ax - nx, ay - ny)],
+                 color, scale, antialias)
+
+def limb_outline(x, y, reach_x, reach_y, width, height):
+    """Return the outline of a width x height block swept from (x, y) to (x + reach_x, y + reach_y).
+
+    This is the outline a row of offset rectangles traces along a rotated
+    limb: the hull of the first and last block.
+    """
+    corners = [(cx + dx, cy + dy) for cx, cy in ((x, y), (x + reach_x, y + reach_y))
+               for dx, dy in ((0, 0), (width, 0), (width, height), (0, height))]
+    return convex_hull(corners)
+
+def draw_limb(canvas, x, y, reach_x, reach_y, width, height, color, scale=1, antialias=False):
+    """Draw a swept limb block (see limb_outline) as a single polygon."""
+    draw_polygon(canvas, limb_outline(x, y, reach_x, reach_y, width, height), color, scale, antialias)
+
+def add_noise(canvas, region_x, region_y, width, height, intensity=0.1, rng=None, scale=1):
+    """Add subtle noise to a region for texture.
+
+    The whole noise field is drawn from rng in one call (a fresh unseeded
+    generator if none is given), so the same generator state always gives
+    the same result. At scale > 1 every output pixel gets its own noise.
+    """
+    x0, x1 = _clip_span(region_x * scale, width * scale, canvas.shape[1])
+    y0, y1 = _clip_span(region_y * scale, height * scale, canvas.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    if rng is None:
+        rng = np.random.default_rng()
+    
+    region = canvas[y0:y1, x0:x1]
+    if canvas.ndim == 2:
+        # Index canvas: dither to neighbouring shades so every pixel stays in the palette
+        noise = rng.normal(0, intensity * 255, size=region.shape)
+        darker, lighter = shade_steps(palette_lut())
+        dither = (region != 0) & (np.abs(noise) > DITHER_STEP)
+        region[dither] = np.where(noise > 0, lighter[region], darker[region])[dither]
+        return
+    noise = rng.normal(0, intensity * 255, size=(y1 - y0, x1 - x0, 3)).astype(np.int32)
+    noisy = np.clip(region[..., :3] + noise, 0, 255).astype(np.uint8)
+    
+    # Only add noise where the pixel is not transparent
+    opaque = region[..., 3] > 0
+    region[..., :3][opaque] = noisy[opaque]
+
+def upscale_nearest(canvas, scale):
+    """Upscale a canvas by an integer factor with exact nearest-neighbour pixel copies."""
+    if scale == 1:
+        return canvas
+    return np.repeat(np.repeat(canvas, scale, axis=0), scale, axis=1)
+
+def draw_outfit(canvas, x, y, width, height, colors_main, colors_shadow, colors_highlight, scale=1):
     """Draw a detailed outfit with proper shading."""
     # Main body of outfit
-    draw_rectangle(canvas, x, y, width, height, colors_main)
+    draw_rectangle(canvas, x, y, width, height, colors_main, scale=scale)
     
     # Left shadow
     shadow_width = max(2, width // 8)
-    draw_rectangle(canvas, x, y, shadow_width, height, colors_shadow)
+    draw_rectangle(canvas, x, y, shadow_width, height, colors_shadow, scale=scale)
     
     # Bottom shadow
     shadow_height = max(2, height // 8)
-    draw_rectangle(canvas, x, y + height - shadow_height, width, shadow_height, colors_shadow)
+    draw_rectangle(canvas, x, y + height - shadow_height, width, shadow_height, colors_shadow, scale=scale)
     
     # Right and top highlights
     highlight_width = max(2, width // 10)
     highlight_height = max(2, height // 10)
-    draw_rectangle(canvas, x + width - highlight_width, y, highlight_width, height - shadow_height, colors_highlight)
-    draw_rectangle(canvas, x + shadow_width, y, width - shadow_width - highlight_width, highlight_height, colors_highlight)
+    draw_rectangle(canvas, x + width - highlight_width, y, highlight_width, height - shadow_height, colors_highlight, scale=scale)
+    draw_rectangle(canvas, x + shadow_width, y, width - shadow_width - highlight_width, highlight_height, colors_highlight, scale=scale)
 
-def draw_face(canvas, x, y, expression="neutral", facing="front"):
+def draw_face(canvas, x, y, expression="neutral", facing="front", size=(24, 26), scale=1):
     """Draw a detailed face with the specified expression."""
     # Face shape (more oval than rectangle)
-    face_width, face_height = 24, 26
+    face_width, face_height = size
     
     # Apply offset for side-facing
     offset_x = 0
@@ -153,44 +585,30 @@ def draw_face(canvas, x, y, expression="neutral", facing="front"):
     elif facing == "right":
         offset_x = 4
     
+    # Create an oval shape, evaluated once for the fill and the outline
+    iy, ix = sample_grid(face_height, face_width, scale)
+    distance = ((ix - face_width // 2)**2 / ((face_width//2)**2)
+                + (iy - face_height // 2)**2 / ((face_height//2)**2))
+    oval = distance <= 1
+    
+    # Add shading based on facing direction
+    shadow = highlight = np.zeros(ix.shape, dtype=bool)
+    if facing == "front":
+        shadow = ix < face_width // 3  # Left side shadow
+        highlight = ix > 2 * face_width // 3  # Right side highlight
+    elif facing == "left":
+        shadow = ix < face_width // 2
+    elif facing == "right":
+        highlight = ix > face_width // 2
+    
     # Base face
-    for iy in range(face_height):
-        for ix in range(face_width):
-            # Create an oval shape
-            dx = ix - face_width // 2
-            dy = iy - face_height // 2
-            distance = (dx**2 / ((face_width//2)**2)) + (dy**2 / ((face_height//2)**2))
-            
-            if distance <= 1:
-                # Base skin
-                skin_color = colors["skin"]
-                
-                # Add shading based on facing direction
-                if facing == "front":
-                    if ix < face_width // 3:
-                        # Left side shadow
-                        skin_color = colors["skin_shadow"]
-                    elif ix > 2 * face_width // 3:
-                        # Right side highlight
-                        skin_color = colors["skin_highlight"]
-                elif facing == "left":
-                    if ix < face_width // 2:
-                        skin_color = colors["skin_shadow"]
-                elif facing == "right":
-                    if ix > face_width // 2:
-                        skin_color = colors["skin_highlight"]
-                
-                draw_pixel(canvas, x + ix + offset_x, y + iy, skin_color)
+    face_x, face_y = (x + offset_x) * scale, y * scale
+    fill_mask(canvas, face_x, face_y, oval & ~shadow & ~highlight, colors["skin"])
+    fill_mask(canvas, face_x, face_y, oval & shadow, colors["skin_shadow"])
+    fill_mask(canvas, face_x, face_y, oval & highlight, colors["skin_highlight"])
     
     # Add outline to the face
-    for iy in range(face_height):
-        for ix in range(face_width):
-            dx = ix - face_width // 2
-            dy = iy - face_height // 2
-            distance = (dx**2 / ((face_width//2)**2)) + (dy**2 / ((face_height//2)**2))
-            
-            if 0.9 < distance <= 1:
-                draw_pixel(canvas, x + ix + offset_x, y + iy, colors["dark_outline"])
+    fill_mask(canvas, face_x, face_y, oval & (distance > 0.9), colors["dark_outline"])
     
     # Eyes position based on facing direction
     eye_y = y + face_height // 3
@@ -201,86 +619,94 @@ def draw_face(canvas, x, y, expression="neutral", facing="front"):
         
         if expression == "neutral" or expression == "talking":
             # Regular eyes
-            draw_rectangle(canvas, left_eye_x - 2, eye_y, 4, 4, colors["white"])
-            draw_rectangle(canvas, right_eye_x - 2, eye_y, 4, 4, colors["white"])
-            draw_rectangle(canvas, left_eye_x, eye_y + 1, 2, 2, colors["black"])
-            draw_rectangle(canvas, right_eye_x, eye_y + 1, 2, 2, colors["black"])
+            draw_rectangle(canvas, left_eye_x - 2, eye_y, 4, 4, colors["white"], scale=scale)
+            draw_rectangle(canvas, right_eye_x - 2, eye_y, 4, 4, colors["white"], scale=scale)
+            draw_rectangle(canvas, left_eye_x, eye_y + 1, 2, 2, colors["black"], scale=scale)
+            draw_rectangle(canvas, right_eye_x, eye_y + 1, 2, 2, colors["black"], scale=scale)
             
         elif expression == "laughing":
             # Happy closed eyes
-            draw_line(canvas, left_eye_x - 3, eye_y, left_eye_x + 2, eye_y - 1, colors["dark_outline"])
-            draw_line(canvas, right_eye_x - 2, eye_y - 1, right_eye_x + 3, eye_y, colors["dark_outline"])
+            draw_line(canvas, left_eye_x - 3, eye_y, left_eye_x + 2, eye_y - 1, colors["dark_outline"], scale=scale)
+            draw_line(canvas, right_eye_x - 2, eye_y - 1, right_eye_x + 3, eye_y, colors["dark_outline"], scale=scale)
             
         elif expression == "thinking":
             # Squinting one eye, raising eyebrow
-            draw_rectangle(canvas, left_eye_x - 2, eye_y, 4, 1, colors["dark_outline"])
-            draw_rectangle(canvas, right_eye_x - 2, eye_y - 1, 4, 3, colors["white"])
-            draw_rectangle(canvas, right_eye_x, eye_y, 2, 2, colors["black"])
+            draw_rectangle(canvas, left_eye_x - 2, eye_y, 4, 1, colors["dark_outline"], scale=scale)
+            draw_rectangle(canvas, right_eye_x - 2, eye_y - 1, 4, 3, colors["white"], scale=scale)
+            draw_rectangle(canvas, right_eye_x, eye_y, 2, 2, colors["black"], scale=scale)
             # Raised eyebrow
-            draw_line(canvas, left_eye_x - 3, eye_y - 3, left_eye_x + 2, eye_y - 4, colors["dark_outline"])
+            draw_line(canvas, left_eye_x - 3, eye_y - 3, left_eye_x + 2, eye_y - 4, colors["dark_outline"], scale=scale)
             
     elif facing == "left":
         # Only show the visible eye when facing left
         visible_eye_x = x + 2 * face_width // 3 + offset_x
         
         if expression == "neutral" or expression == "talking":
-            draw_rectangle(canvas, visible_eye_x - 2, eye_y, 4, 4, colors["white"])
-            draw_rectangle(canvas, visible_eye_x, eye_y + 1, 2, 2, colors["black"])
+            draw_rectangle(canvas, visible_eye_x - 2, eye_y, 4, 4, colors["white"], scale=scale)
+            draw_rectangle(canvas, visible_eye_x, eye_y + 1, 2, 2, colors["black"], scale=scale)
         elif expression == "laughing":
-            draw_line(canvas, visible_eye_x - 2, eye_y - 1, visible_eye_x + 3, eye_y, colors["dark_outline"])
+            draw_line(canvas, visible_eye_x - 2, eye_y - 1, visible_eye_x + 3, eye_y, colors["dark_outline"], scale=scale)
         elif expression == "thinking":
-            draw_rectangle(canvas, visible_eye_x - 2, eye_y - 1, 4, 3, colors["white"])
-            draw_rectangle(canvas, visible_eye_x, eye_y, 2, 2, colors["black"])
+            draw_rectangle(canvas, visible_eye_x - 2, eye_y - 1, 4, 3, colors["white"], scale=scale)
+            draw_rectangle(canvas, visible_eye_x, eye_y, 2, 2, colors["black"], scale=scale)
             
     elif facing == "right":
         # Only show the visible eye when facing right
         visible_eye_x = x + face_width // 3 + offset_x
         
         if expression == "neutral" or expression == "talking":
-            draw_rectangle(canvas, visible_eye_x - 2, eye_y, 4, 4, colors["white"])
-            draw_rectangle(canvas, visible_eye_x, eye_y + 1, 2, 2, colors["black"])
+            draw_rectangle(canvas, visible_eye_x - 2, eye_y, 4, 4, colors["white"], scale=scale)
+            draw_rectangle(canvas, visible_eye_x, eye_y + 1, 2, 2, colors["black"], scale=scale)
         elif expression == "laughing":
-            draw_line(canvas, visible_eye_x - 3, eye_y, visible_eye_x + 2, eye_y - 1, colors["dark_outline"])
+            draw_line(canvas, visible_eye_x - 3, eye_y, visible_eye_x + 2, eye_y - 1, colors["dark_outline"], scale=scale)
         elif expression == "thinking":
-            draw_rectangle(canvas, visible_eye_x - 2, eye_y - 1, 4, 3, colors["white"])
-            draw_rectangle(canvas, visible_eye_x, eye_y, 2, 2, colors["black"])
+            draw_rectangle(canvas, visible_eye_x - 2, eye_y - 1, 4, 3, colors["white"], scale=scale)
+            draw_rectangle(canvas, visible_eye_x, eye_y, 2, 2, colors["black"], scale=scale)
     
     # Mouth based on expression
     mouth_y = y + 3 * face_height // 4
     mouth_x = x + face_width // 2 - 5 + offset_x
     
     if expression == "neutral":
-        draw_line(canvas, mouth_x, mouth_y, mouth_x + 10, mouth_y, colors["dark_outline"])
+        draw_line(canvas, mouth_x, mouth_y, mouth_x + 10, mouth_y, colors["dark_outline"], scale=scale)
         
     elif expression == "talking":
         # More expressive talking mouth
-        draw_rectangle(canvas, mouth_x, mouth_y - 2, 10, 5, colors["dark_outline"])
-        draw_rectangle(canvas, mouth_x + 1, mouth_y - 1, 8, 3, colors["red_dark"])
+        draw_rectangle(canvas, mouth_x, mouth_y - 2, 10, 5, colors["dark_outline"], scale=scale)
+        draw_rectangle(canvas, mouth_x + 1, mouth_y - 1, 8, 3, colors["red_dark"], scale=scale)
         # Add teeth for more expression
         for i in range(1, 8, 2):
-            draw_rectangle(canvas, mouth_x + i, mouth_y - 1, 1, 1, colors["white"])
+            draw_rectangle(canvas, mouth_x + i, mouth_y - 1, 1, 1, colors["white"], scale=scale)
         
     elif expression == "laughing":
         # Big happy smile with teeth
-        draw_rectangle(canvas, mouth_x - 1, mouth_y - 4, 12, 7, colors["dark_outline"])
-        draw_rectangle(canvas, mouth_x, mouth_y - 3, 10, 5, colors["red_dark"])
+        draw_rectangle(canvas, mouth_x - 1, mouth_y - 4, 12, 7, colors["dark_outline"], scale=scale)
+        draw_rectangle(canvas, mouth_x, mouth_y - 3, 10, 5, colors["red_dark"], scale=scale)
         
         # Teeth
         for i in range(1, 9, 2):
-            draw_rectangle(canvas, mouth_x + i, mouth_y - 3, 1, 2, colors["white"])
+            draw_rectangle(canvas, mouth_x + i, mouth_y - 3, 1, 2, colors["white"], scale=scale)
             
         # Add laugh lines around eyes
         if facing == "front":
-            draw_line(canvas, x + face_width // 4, eye_y - 5, x + face_width // 3 - 2, eye_y - 2, colors["dark_outline"])
-            draw_line(canvas, x + 3*face_width // 4, eye_y - 5, x + 2*face_width // 3 + 2, eye_y - 2, colors["dark_outline"])
+            draw_line(canvas, x + face_width // 4, eye_y - 5, x + face_width // 3 - 2, eye_y - 2, colors["dark_outline"], scale=scale)
+            draw_line(canvas, x + 3*face_width // 4, eye_y - 5, x + 2*face_width // 3 + 2, eye_y - 2, colors["dark_outline"], scale=scale)
     
     elif expression == "thinking":
         # Thoughtful expression - mouth to the side
-        draw_line(canvas, mouth_x + 2, mouth_y, mouth_x + 8, mouth_y, colors["dark_outline"])
-        draw_line(canvas, mouth_x + 2, mouth_y + 1, mouth_x + 5, mouth_y + 2, colors["dark_outline"])
+        draw_line(canvas, mouth_x + 2, mouth_y, mouth_x + 8, mouth_y, colors["dark_outline"], scale=scale)
+        draw_line(canvas, mouth_x + 2, mouth_y + 1, mouth_x + 5, mouth_y + 2, colors["dark_outline"], scale=scale)
+
+HAIR_STYLES = ("comedian", "full", "flat_top", "bald")
+
+def draw_hair(canvas, x, y, style="comedian", facing="front", scale=1):
+    """Draw detailed hair in one of HAIR_STYLES.
 
-def draw_hair(canvas, x, y, style="comedian", facing="front"):
-    """Draw detailed hair with style variations."""
+    Every style shares the side hair; they differ in what covers the top
+    of the head.
+    """
+    if style not in HAIR_STYLES:
+        raise ValueError(f"unknown hair style {style!r}")
     face_width, face_height = 24, 26
     
     # Apply offset for side-facing
@@ -300,746 +726,824 @@ def draw_hair(canvas, x, y, style="comedian", facing="front"):
                     hair_color = colors["brown_dark"]
                     if ix > face_width // 2:
                         hair_color = colors["brown"]
-                    draw_pixel(canvas, x + ix + offset_x, y - iy - 1, hair_color)
+                    draw_pixel(canvas, x + ix + offset_x, y - iy - 1, hair_color, scale=scale)
         
-        # Hair sides - adjust based on facing
-        if facing == "front":
-            # Both sides visible
-            for iy in range(face_height // 2):
-                side_width = 4 if iy < face_height // 4 else 3
-                # Left side
-                for ix in range(side_width):
-                    draw_pixel(canvas, x - ix - 1, y + iy, colors["brown_dark"])
-                # Right side
-                for ix in range(side_width):
-                    draw_pixel(canvas, x + face_width + ix, y + iy, colors["brown"])
-        elif facing == "left":
-            # Right side hair more visible
-            for iy in range(face_height // 2):
-                side_width = 5 if iy < face_height // 4 else 4
-                for ix in range(side_width):
-                    draw_pixel(canvas, x + face_width + ix + offset_x, y + iy, colors["brown"])
-        elif facing == "right":
-            # Left side hair more visible
-            for iy in range(face_height // 2):
-                side_width = 5 if iy < face_height // 4 else 4
-                for ix in range(side_width):
-                    draw_pixel(canvas, x - ix - 1 + offset_x, y + iy, colors["brown_dark"])
-                
         # Add some hair texture
         for i in range(0, face_width, 6):
             if i < face_width // 3 - 3 or i > 2 * face_width // 3 + 3:
-                draw_line(canvas, x + i + offset_x, y - 1, x + i + 1 + offset_x, y - 3, colors["brown_dark"])
+                draw_line(canvas, x + i + offset_x, y - 1, x + i + 1 + offset_x, y - 3, colors["brown_dark"], scale=scale)
+    elif style == "full":
+        # A full head of hair, parted on the left and sweeping over the crown
+        part_x = face_width // 3
+        draw_rectangle(canvas, x - 3 + offset_x, y - 3, part_x + 3, 4, colors["brown_dark"], scale=scale)
+        draw_rectangle(canvas, x + part_x + 1 + offset_x, y - 4, face_width + 2 - part_x, 5, colors["brown"], scale=scale)
+        draw_line(canvas, x + part_x + 3 + offset_x, y - 3, x + face_width + offset_x, y - 2,
+                  colors["brown_light"], scale=scale)
+    elif style == "flat_top":
+        # A square-cut block standing straight up from the hairline
+        draw_rectangle(canvas, x - 2 + offset_x, y - 6, face_width + 4, 7, colors["brown_dark"], scale=scale)
+        draw_rectangle(canvas, x - 2 + offset_x, y - 6, face_width + 4, 2, colors["brown"], scale=scale)
+    
+    # Hair sides - adjust based on facing
+    if facing == "front":
+        # Both sides visible
+        for iy in range(face_height // 2):
+            side_width = 4 if iy < face_height // 4 else 3
+            # Left side
+            for ix in range(side_width):
+                draw_pixel(canvas, x - ix - 1, y + iy, colors["brown_dark"], scale=scale)
+            # Right side
+            for ix in range(side_width):
+                draw_pixel(canvas, x + face_width + ix, y + iy, colors["brown"], scale=scale)
+    elif facing == "left":
+        # Right side hair more visible
+        for iy in range(face_height // 2):
+            side_width = 5 if iy < face_height // 4 else 4
+            for ix in range(side_width):
+                draw_pixel(canvas, x + face_width + ix + offset_x, y + iy, colors["brown"], scale=scale)
+    elif facing == "right":
+        # Left side hair more visible
+        for iy in range(face_height // 2):
+            side_width = 5 if iy < face_height // 4 else 4
+            for ix in range(side_width):
+                draw_pixel(canvas, x - ix - 1 + offset_x, y + iy, colors["brown_dark"], scale=scale)
 
-def draw_bow_tie(canvas, x, y, size=10):
+def draw_bow_tie(canvas, x, y, size=10, scale=1):
     """Draw a fancy bow tie."""
     # Center knot
-    draw_rectangle(canvas, x - size//6, y - size//6, size//3, size//3, colors["red_dark"])
-    
-    # Left bow
-    for i in range(size//2):
-        for j in range(size//3):
-            dx = i - size//4
-            dy = j - size//6
-            if dx**2 + dy**2 <= (size//3)**2:
-                color = colors["red"]
-                if i < size//6:
-                    color = colors["red_dark"]
-                draw_pixel(canvas, x - size//2 - i, y - size//6 + j, color)
+    draw_rectangle(canvas, x - size//6, y - size//6, size//3, size//3, colors["red_dark"], scale=scale)
+    
+    # Bow lobes: j runs down the rows, i runs away from the knot
+    j, i = sample_grid(size//3, size//2, scale)
+    lobe = (i - size//4)**2 + (j - size//6)**2 <= (size//3)**2
+    top = (y - size//6) * scale
+    
+    # Left bow (mirrored, so column i lands at x - size//2 - i)
+    left_x = (x - size//2 - (size//2 - 1)) * scale
+    inner = i < size//6
+    fill_mask(canvas, left_x, top, (lobe & ~inner)[:, ::-1], colors["red"])
+    fill_mask(canvas, left_x, top, (lobe & inner)[:, ::-1], colors["red_dark"])
     
     # Right bow
-    for i in range(size//2):
-        for j in range(size//3):
-            dx = i - size//4
-            dy = j - size//6
-            if dx**2 + dy**2 <= (size//3)**2:
-                color = colors["red"]
-                if i > size//3:
-                    color = colors["red_light"]
-                draw_pixel(canvas, x + size//2 + i - size//2, y - size//6 + j, color)
+    outer = i > size//3
+    fill_mask(canvas, x * scale, top, lobe & ~outer, colors["red"])
+    fill_mask(canvas, x * scale, top, lobe & outer, colors["red_light"])
 
 # =========================
-# IMPROVED PACING ANIMATION
+# LAYER COMPOSITING
 # =========================
 
-def create_pacing_frames(size=CHAR_SIZE, num_frames=4):
-    """Create multiple frames for pacing animation in both directions."""
-    frames_right = []
-    frames_left = []
-    
-    # Create walking animation frames for right direction
-    for frame in range(num_frames):
-        canvas = create_blank_canvas(size, size)
-        
-        # Character positioning variables
-        center_x = size // 2
-        head_size = 24
-        head_x = center_x - head_size // 2
-        head_y = size // 4
-        
-        # Body variables
-        body_width = 30
-        body_height = 40
-        body_x = center_x - body_width // 2
-        body_y = head_y + head_size - 5
-        
-        # Draw detailed suit (jacket)
-        draw_outfit(canvas, body_x, body_y, body_width, body_height, 
-                   colors["blue"], colors["blue_dark"], colors["blue_light"])
-        
-        # Draw shirt collar
-        collar_width = body_width - 10
-        collar_height = 8
-        collar_x = body_x + 5
-        collar_y = body_y
-        draw_rectangle(canvas, collar_x, collar_y, collar_width, collar_height, colors["white"])
-        
-        # Draw face - facing right for this direction
-        draw_face(canvas, head_x, head_y, "neutral", "right")
-        
-        # Draw hair
-        draw_hair(canvas, head_x, head_y, "comedian", "right")
-        
-        # Draw bow tie
-        bow_tie_x = center_x
-        bow_tie_y = body_y + 6
-        draw_bow_tie(canvas, bow_tie_x, bow_tie_y, 12)
-        
-        # Draw arms behind back
-        arm_width = 6
-        arm_height = 25
-        arm_gap = 6
-        
-        # Draw arms meeting at the back
-        draw_outfit(canvas, center_x - arm_gap//2 - arm_width, body_y + 8, 
-                   arm_width, arm_height, colors["blue"], colors["blue_dark"], colors["blue_light"])
-        draw_outfit(canvas, center_x + arm_gap//2, body_y + 8, 
-                   arm_width, arm_height, colors["blue"], colors["blue_dark"], colors["blue_light"])
-        
-        # Hands clasped behind back
-        hand_width = 16
-        hand_height = 8
-        draw_rectangle(canvas, center_x - hand_width//2, body_y + 8 + arm_height - 4, 
-                      hand_width, hand_height, colors["skin"])
-        
-        # Draw legs with animation
-        leg_width = 10
-        leg_spacing = 3
-        
-        # Animation parameters
-        stride = 8  # Maximum stride length
-        leg_offset = int(stride * math.sin(2 * math.pi * frame / num_frames))
-        
-        # Forward leg
-        forward_leg_x = center_x - leg_width - leg_spacing + leg_offset
-        draw_rectangle(canvas, forward_leg_x, body_y + body_height - 5, 
-                      leg_width, 35, colors["dark_gray"])
-        
-        # Back leg
-        back_leg_x = center_x + leg_spacing - leg_offset
-        draw_rectangle(canvas, back_leg_x, body_y + body_height - 5, 
-                      leg_width, 35, colors["dark_gray"])
-        
-        # Draw shoes
-        shoe_width = 14
-        shoe_height = 6
-        
-        # Forward shoe
-        draw_rectangle(canvas, forward_leg_x - 2, body_y + body_height - 5 + 35 - 1, 
-                      shoe_width, shoe_height, colors["brown_dark"])
-        
-        # Back shoe
-        draw_rectangle(canvas, back_leg_x - 2, body_y + body_height - 5 + 35 - 1, 
-                      shoe_width, shoe_height, colors["brown_dark"])
-        
-        # Add final details
-        add_noise(canvas, 0, 0, size, size, 0.02)
-        
-        frames_right.append(canvas)
-        
-        # Save this frame
-        save_image(canvas, f"comedian_pacing_right_{frame+1}.png")
+# Body parts that look the same in every frame (suit, collar, hair, bow tie)
+# are drawn once onto their own transparent tile and alpha-composited into
+# each frame. Tiles are keyed by their parameters and the current palette,
+# and both tile caches are LRU-bounded so new sizes or palettes can't grow
+# memory without limit.
+
+TILE_CACHE_SIZE = 64
+FACE_CACHE_SIZE = 48  # 4 expressions x 3 facings, for a few face sizes
+
+# Space left around the face box for hair and facial details that reach past it
+TILE_MARGIN = 8
+
+def composite(canvas, tile, x, y):
+    """Alpha-composite an RGBA tile over the canvas with its top-left corner at (x, y)."""
+    tile_height, tile_width = tile.shape[:2]
+    x0, x1 = _clip_span(x, tile_width, canvas.shape[1])
+    y0, y1 = _clip_span(y, tile_height, canvas.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    region = canvas[y0:y1, x0:x1]
+    src = tile[y0 - y:y1 - y, x0 - x:x1 - x]
+    if tile.ndim == 2:
+        # Index tiles have no partial alpha: every non-transparent index replaces the canvas
+        opaque = src != 0
+        region[opaque] = src[opaque]
+        return
+    src_alpha = src[..., 3]
     
-    # Create walking animation frames for left direction
-    for frame in range(num_frames):
-        canvas = create_blank_canvas(size, size)
-        
-        # Character positioning variables
-        center_x = size // 2
-        head_size = 24
-        head_x = center_x - head_size // 2
-        head_y = size // 4
-        
-        # Body variables
-        body_width = 30
-        body_height = 40
-        body_x = center_x - body_width // 2
-        body_y = head_y + head_size - 5
-        
-        # Draw detailed suit (jacket)
-        draw_outfit(canvas, body_x, body_y, body_width, body_height, 
-                   colors["blue"], colors["blue_dark"], colors["blue_light"])
-        
-        # Draw shirt collar
-        collar_width = body_width - 10
-        collar_height = 8
-        collar_x = body_x + 5
-        collar_y = body_y
-        draw_rectangle(canvas, collar_x, collar_y, collar_width, collar_height, colors["white"])
-        
-        # Draw face - facing left for this direction
-        draw_face(canvas, head_x, head_y, "neutral", "left")
-        
-        # Draw hair
-        draw_hair(canvas, head_x, head_y, "comedian", "left")
-        
-        # Draw bow tie
-        bow_tie_x = center_x
-        bow_tie_y = body_y + 6
-        draw_bow_tie(canvas, bow_tie_x, bow_tie_y, 12)
-        
-        # Draw arms behind back
-        arm_width = 6
-        arm_height = 25
-        arm_gap = 6
-        
-        # Draw arms meeting at the back
-        draw_outfit(canvas, center_x - arm_gap//2 - arm_width, body_y + 8, 
-                   arm_width, arm_height, colors["blue"], colors["blue_dark"], colors["blue_light"])
-        draw_outfit(canvas, center_x + arm_gap//2, body_y + 8, 
-                   arm_width, arm_height, colors["blue"], colors["blue_dark"], colors["blue_light"])
-        
-        # Hands clasped behind back
-        hand_width = 16
-        hand_height = 8
-        draw_rectangle(canvas, center_x - hand_width//2, body_y + 8 + arm_height - 4, 
-                      hand_width, hand_height, colors["skin"])
-        
-        # Draw legs with animation
-        leg_width = 10
-        leg_spacing = 3
-        
-        # Animation parameters
-        stride = 8  # Maximum stride length
-        leg_offset = int(stride * math.sin(2 * math.pi * frame / num_frames))
-        
-        # Forward leg (reversed for left direction)
-        forward_leg_x = center_x + leg_spacing - leg_offset
-        draw_rectangle(canvas, forward_leg_x, body_y + body_height - 5, 
-                      leg_width, 35, colors["dark_gray"])
-        
-        # Back leg (reversed for left direction)
-        back_leg_x = center_x - leg_width - leg_spacing + leg_offset
-        draw_rectangle(canvas, back_leg_x, body_y + body_height - 5, 
-                      leg_width, 35, colors["dark_gray"])
-        
-        # Draw shoes
-        shoe_width = 14
-        shoe_height = 6
-        
-        # Forward shoe
-        draw_rectangle(canvas, forward_leg_x - 2, body_y + body_height - 5 + 35 - 1, 
-                      shoe_width, shoe_height, colors["brown_dark"])
-        
-        # Back shoe
-        draw_rectangle(canvas, back_leg_x - 2, body_y + body_height - 5 + 35 - 1, 
-                      shoe_width, shoe_height, colors["brown_dark"])
-        
-        # Add final details
-        add_noise(canvas, 0, 0, size, size, 0.02)
-        
-        frames_left.append(canvas)
-        
-        # Save this frame
-        save_image(canvas, f"comedian_pacing_left_{frame+1}.png")
+    # Opaque pixels replace the canvas, transparent ones leave it alone
+    opaque = src_alpha == 255
+    region[opaque] = src[opaque]
     
-    return frames_right, frames_left
+    # Blend any partially transparent pixels with the "over" operator
+    partial = (src_alpha > 0) & ~opaque
+    if partial.any():
+        a = src_alpha[partial, np.newaxis] / 255.0
+        b = region[partial, 3:] / 255.0 * (1 - a)
+        out_alpha = a + b
+        rgb = (src[partial, :3] * a + region[partial, :3] * b) / out_alpha
+        region[partial] = np.rint(np.concatenate([rgb, out_alpha * 255], axis=1)).astype(np.uint8)
 
-# =========================
-# IMPROVED TALKING ANIMATION
-# =========================
+def palette_key():
+    """Return a hashable snapshot of the palette, so cached tiles follow palette changes."""
+    return tuple(colors.items())
 
-def create_talking_frames(size=CHAR_SIZE, num_frames=3):
-    """Create multiple frames for talking animation with expressive gestures."""
-    frames = []
-    
-    for frame in range(num_frames):
-        canvas = create_blank_canvas(size, size)
-        
-        # Character positioning variables
-        center_x = size // 2
-        head_size = 24
-        head_x = center_x - head_size // 2
-        head_y = size // 4
-        
-        # Body variables
-        body_width = 30
-        body_height = 40
-        body_x = center_x - body_width // 2
-        body_y = head_y + head_size - 5
-        
-        # Draw detailed suit (jacket)
-        draw_outfit(canvas, body_x, body_y, body_width, body_height, 
-                   colors["blue"], colors["blue_dark"], colors["blue_light"])
-        
-        # Draw shirt collar
-        collar_width = body_width - 10
-        collar_height = 8
-        collar_x = body_x + 5
-        collar_y = body_y
-        draw_rectangle(canvas, collar_x, collar_y, collar_width, collar_height, colors["white"])
-        
-        # Draw face
-        # Different mouth positions for talking
-        mouth_expressions = ["talking", "neutral", "talking"]
-        draw_face(canvas, head_x, head_y, mouth_expressions[frame % len(mouth_expressions)])
-        
-        # Draw hair
-        draw_hair(canvas, head_x, head_y, "comedian")
-        
-        # Draw bow tie
-        bow_tie_x = center_x
-        bow_tie_y = body_y + 6
-        draw_bow_tie(canvas, bow_tie_x, bow_tie_y, 12)
-        
-        # Draw arms with different gestures based on frame
-        arm_width = 8
-        
-        if frame == 0:
-            # First frame: One arm pointing upward, other arm relaxed
-            # Left arm relaxed
-            left_arm_angle = math.pi / 6  # 30 degrees
-            left_arm_length = 28
-            
-            for y in range(left_arm_length):
-                x_offset = int(y * math.sin(left_arm_angle))
-                y_offset = int(y * math.cos(left_arm_angle))
-                
-                draw_rectangle(canvas, body_x - arm_width - x_offset, body_y + 5 + y_offset, 
-                              arm_width, 4, colors["blue"])
-            
-            # Right arm pointing up
-            right_arm_angle = -math.pi / 2  # -90 degrees (straight up)
-            right_arm_length = 30
-            
-            for y in range(right_arm_length):
-                x_offset = int(y * math.sin(right_arm_angle))
-                y_offset = int(y * math.cos(right_arm_angle))
-                
-                draw_rectangle(canvas, body_x + body_width + x_offset, body_y + 5 + y_offset, 
-                              arm_width, 4, colors["blue"])
-            
-            # Hands
-            # Left hand
-            left_hand_x = body_x - arm_width - int(left_arm_length * math.sin(left_arm_angle))
-            left_hand_y = body_y + 5 + int(left_arm_length * math.cos(left_arm_angle))
-            draw_rectangle(canvas, left_hand_x - 10, left_hand_y - 5, 
-                          10, 10, colors["skin"])
-            
-            # Right hand
-            right_hand_x = body_x + body_width + int(right_arm_length * math.sin(right_arm_angle))
-            right_hand_y = body_y + 5 + int(right_arm_length * math.cos(right_arm_angle))
-            draw_rectangle(canvas, right_hand_x - 5, right_hand_y - 10, 
-                          10, 10, colors["skin"])
-            
-        elif frame == 1:
-            # Second frame: Both arms gesturing outward
-            # Left arm out
-            left_arm_angle = math.pi / 4  # 45 degrees
-            left_arm_length = 30
-            
-            for y in range(left_arm_length):
-                x_offset = int(y * math.sin(left_arm_angle))
-                y_offset = int(y * math.cos(left_arm_angle))
-                
-                draw_rectangle(canvas, body_x - arm_width - x_offset, body_y + 5 + y_offset, 
-                              arm_width, 4, colors["blue"])
-            
-            # Right arm out
-            right_arm_angle = -math.pi / 4  # -45 degrees
-            right_arm_length = 30
-            
-            for y in range(right_arm_length):
-                x_offset = int(y * math.sin(right_arm_angle))
-                y_offset = int(y * math.cos(right_arm_angle))
-                
-                draw_rectangle(canvas, body_x + body_width + x_offset, body_y + 5 + y_offset, 
-                              arm_width, 4, colors["blue"])
-            
-            # Hands
-            # Left hand
-            left_hand_x = body_x - arm_width - int(left_arm_length * math.sin(left_arm_angle))
-            left_hand_y = body_y + 5 + int(left_arm_length * math.cos(left_arm_angle))
-            draw_rectangle(canvas, left_hand_x - 10, left_hand_y - 5, 
-                          10, 10, colors["skin"])
-            
-            # Right hand
-            right_hand_x = body_x + body_width + int(right_arm_length * math.sin(right_arm_angle))
-            right_hand_y = body_y + 5 + int(right_arm_length * math.cos(right_arm_angle))
-            draw_rectangle(canvas, right_hand_x, right_hand_y - 5, 
-                          10, 10, colors["skin"])
-            
-        elif frame == 2:
-            # Third frame: One arm forward in explanation
-            # Left arm relaxed
-            left_arm_angle = math.pi / 12  # 15 degrees
-            left_arm_length = 25
-            
-            for y in range(left_arm_length):
-                x_offset = int(y * math.sin(left_arm_angle))
-                y_offset = int(y * math.cos(left_arm_angle))
-                
-                draw_rectangle(canvas, body_x - arm_width - x_offset, body_y + 5 + y_offset, 
-                              arm_width, 4, colors["blue"])
-            
-            # Right arm forward
-            right_arm_angle = -math.pi / 12  # -15 degrees
-            right_arm_length = 25
-            
-            for y in range(right_arm_length):
-                x_offset = int(y * math.sin(right_arm_angle))
-                y_offset = int(y * math.cos(right_arm_angle))
-                
-                # First part of arm
-                draw_rectangle(canvas, body_x + body_width + x_offset, body_y + 5 + y_offset, 
-                              arm_width, 4, colors["blue"])
-            
-            # Second part of right arm (bent)
-            second_arm_angle = 0  # straight forward
-            second_arm_length = 15
-            second_arm_start_x = body_x + body_width + int(right_arm_length * math.sin(right_arm_angle))
-            second_arm_start_y = body_y + 5 + int(right_arm_length * math.cos(right_arm_angle))
-            
-            for y in range(second_arm_length):
-                x_offset = int(y * math.sin(second_arm_angle))
-                y_offset = int(y * math.cos(second_arm_angle))
-                
-                draw_rectangle(canvas, second_arm_start_x + x_offset, second_arm_start_y + y_offset, 
-                              arm_width, 4, colors["blue"])
-            
-            # Hands
-            # Left hand
-            left_hand_x = body_x - arm_width - int(left_arm_length * math.sin(left_arm_angle))
-            left_hand_y = body_y + 5 + int(left_arm_length * math.cos(left_arm_angle))
-            draw_rectangle(canvas, left_hand_x - 10, left_hand_y - 5, 
-                          10, 10, colors["skin"])
-            
-            # Right hand
-            right_hand_x = second_arm_start_x + int(second_arm_length * math.sin(second_arm_angle))
-            right_hand_y = second_arm_start_y + int(second_arm_length * math.cos(second_arm_angle))
-            draw_rectangle(canvas, right_hand_x, right_hand_y - 5, 
-                          10, 10, colors["skin"])
-        
-        # Draw legs
-        leg_width = 10
-        leg_gap = 5
-        
-        # Left leg
-        draw_rectangle(canvas, center_x - leg_width - leg_gap//2, body_y + body_height - 5, 
-                      leg_width, 35, colors["dark_gray"])
-        
-        # Right leg
-        draw_rectangle(canvas, center_x + leg_gap//2, body_y + body_height - 5, 
-                      leg_width, 35, colors["dark_gray"])
-        
-        # Draw shoes
-        shoe_width = 14
-        shoe_height = 6
-        
-        # Left shoe
-        draw_rectangle(canvas, center_x - leg_width - leg_gap//2 - 2, 
-                      body_y + body_height - 5 + 35 - 1, 
-                      shoe_width, shoe_height, colors["brown_dark"])
-        
-        # Right shoe
-        draw_rectangle(canvas, center_x + leg_gap//2 - 2, 
-                      body_y + body_height - 5 + 35 - 1, 
-                      shoe_width, shoe_height, colors["brown_dark"])
-        
-        # Add final details
-        add_noise(canvas, 0, 0, size, size, 0.02)
-        
-        frames.append(canvas)
-        
-        # Save this frame
-        save_image(canvas, f"comedian_talking_{frame+1}.png")
+def render_tile(draw, width, height, origin_x, origin_y, params, scale=1):
+    """Render draw(tile, origin_x, origin_y, *params) onto a new read-only tile.
+
+    Sizes and origins are in base pixels. Cached tiles are shared by every
+    frame that uses them, so they must never be modified in place.
+    """
+    tile = create_blank_canvas(width * scale, height * scale)
+    draw(tile, origin_x, origin_y, *params, scale=scale)
+    tile.flags.writeable = False
+    return tile
+
+@functools.lru_cache(maxsize=TILE_CACHE_SIZE)
+def part_tile(draw, width, height, origin_x, origin_y, params, scale, palette):
+    """Return the cached tile for a body part (palette is only part of the key)."""
+    return render_tile(draw, width, height, origin_x, origin_y, params, scale)
+
+@functools.lru_cache(maxsize=FACE_CACHE_SIZE)
+def face_tile(expression, facing, size, scale, palette):
+    """Return the cached face tile for one (expression, facing, size) combination."""
+    face_width, face_height = size
+    return render_tile(draw_face, face_width + 2 * TILE_MARGIN, face_height + 2 * TILE_MARGIN,
+                       TILE_MARGIN, TILE_MARGIN, (expression, facing, size), scale)
+
+def draw_cached(canvas, draw, x, y, params, width, height, origin_x=0, origin_y=0, scale=1):
+    """Draw a body part through the tile cache, placing the tile origin at (x, y)."""
+    tile = part_tile(draw, width, height, origin_x, origin_y, tuple(params), scale, palette_key())
+    composite(canvas, tile, (x - origin_x) * scale, (y - origin_y) * scale)
+
+def draw_suit(canvas, x, y, body_width, body_height, scale=1):
+    """Draw the suit jacket with its white shirt collar."""
+    # Draw detailed suit (jacket)
+    draw_outfit(canvas, x, y, body_width, body_height, 
+               colors["blue"], colors["blue_dark"], colors["blue_light"], scale=scale)
     
-    return frames
+    # Draw shirt collar
+    collar_width = body_width - 10
+    collar_height = 8
+    draw_rectangle(canvas, x + 5, y, collar_width, collar_height, colors["white"], scale=scale)
+
+def draw_suit_layer(canvas, x, y, body_width, body_height, scale=1):
+    """Composite the cached suit and collar with the jacket's top-left at (x, y)."""
+    draw_cached(canvas, draw_suit, x, y, (body_width, body_height), body_width, body_height,
+                scale=scale)
+
+def draw_face_layer(canvas, x, y, expression="neutral", facing="front", size=(24, 26), scale=1):
+    """Composite the cached face tile with the face box's top-left at (x, y)."""
+    tile = face_tile(expression, facing, tuple(size), scale, palette_key())
+    composite(canvas, tile, (x - TILE_MARGIN) * scale, (y - TILE_MARGIN) * scale)
+
+def draw_hair_layer(canvas, x, y, style="comedian", facing="front", scale=1):
+    """Composite the cached hair for a face whose top-left is at (x, y)."""
+    draw_cached(canvas, draw_hair, x, y, (style, facing),
+                24 + 2 * TILE_MARGIN, 26 + 2 * TILE_MARGIN, TILE_MARGIN, TILE_MARGIN, scale)
+
+def draw_bow_tie_layer(canvas, x, y, size=10, scale=1):
+    """Composite the cached bow tie centred at (x, y)."""
+    draw_cached(canvas, draw_bow_tie, x, y, (size,), 2 * size, 2 * size, size, size, scale)
 
 # =========================
-# IMPROVED LAUGHING ANIMATION
+# DISPLAY LISTS
 # =========================
 
-def create_laughing_frames(size=CHAR_SIZE, num_frames=3):
-    """Create multiple frames for laughing animation with expressive body movement."""
-    frames = []
+# A frame builder can record what it draws instead of drawing it straight
+# into a canvas. A display list is a sequence of plain (op, color, *geometry)
+# tuples in base pixels, whose colours are colors keys, so one list renders
+# under any palette (and as indices under indexed_colors). Before running,
+# a list is optimized: commands off the canvas are dropped, commands a later
+# rectangle paints over completely are culled and neighbouring rectangles of
+# one colour are merged. Lists serialize to JSON, hash to a digest and diff
+# command by command, and rendered lists are cached per command stream.
+
+DISPLAY_LIST_CACHE_SIZE = 32
+
+# Cached layers a blit can place: (draw function, tile geometry from the
+# blit's parameters as width, height, origin_x, origin_y)
+LAYERS = {
+    "suit": (draw_suit_layer, lambda body_width, body_height: (body_width, body_height, 0, 0)),
+    "face": (draw_face_layer, lambda expression, facing, size:
+             (size[0] + 2 * TILE_MARGIN, size[1] + 2 * TILE_MARGIN, TILE_MARGIN, TILE_MARGIN)),
+    "hair": (draw_hair_layer, lambda style, facing:
+             (24 + 2 * TILE_MARGIN, 26 + 2 * TILE_MARGIN, TILE_MARGIN, TILE_MARGIN)),
+    "bow_tie": (draw_bow_tie_layer, lambda size: (2 * size, 2 * size, size, size)),
+}
+
+def _freeze(value):
+    """Turn the lists JSON gives back into tuples, so commands stay hashable."""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+class DisplayList:
+    """A recorded sequence of draw commands.
+
+    The recording methods mirror the draw_* functions without the canvas
+    and scale; colours are colors keys (or literal RGBA tuples) and blits
+    name an entry of LAYERS with that layer's full parameters.
+    """
     
-    for frame in range(num_frames):
-        canvas = create_blank_canvas(size, size)
-        
-        # Character positioning variables with slight up/down movement for laughter
-        center_x = size // 2
-        vertical_bounce = int(3 * math.sin(2 * math.pi * frame / num_frames))
-        
-        head_size = 24
-        head_x = center_x - head_size // 2
-        head_y = size // 4 + vertical_bounce
-        
-        # Body variables
-        body_width = 30
-        body_height = 40
-        body_x = center_x - body_width // 2
-        body_y = head_y + head_size - 5
-        
-        # Draw detailed suit (jacket)
-        draw_outfit(canvas, body_x, body_y, body_width, body_height, 
-                   colors["blue"], colors["blue_dark"], colors["blue_light"])
-        
-        # Draw shirt collar
-        collar_width = body_width - 10
-        collar_height = 8
-        collar_x = body_x + 5
-        collar_y = body_y
-        draw_rectangle(canvas, collar_x, collar_y, collar_width, collar_height, colors["white"])
-        
-        # Draw face with laughing expression
-        draw_face(canvas, head_x, head_y, "laughing")
-        
-        # Draw hair
-        draw_hair(canvas, head_x, head_y, "comedian")
-        
-        # Draw bow tie
-        bow_tie_x = center_x
-        bow_tie_y = body_y + 6
-        draw_bow_tie(canvas, bow_tie_x, bow_tie_y, 12)
-        
-        # Draw arms with different gestures based on frame for laughing animation
-        arm_width = 8
-        
-        # Animation parameters
-        laugh_intensity = 0.8 + 0.2 * math.sin(2 * math.pi * frame / num_frames)  # 0.8-1.0 range
-        
-        # Left arm raised and moving
-        left_arm_angle = math.pi / 3 * laugh_intensity  # 60 degrees * intensity
-        left_arm_length = 30
-        
-        for y in range(left_arm_length):
-            x_offset = int(y * math.sin(left_arm_angle))
-            y_offset = int(y * math.cos(left_arm_angle))
-            
-            draw_rectangle(canvas, body_x - arm_width - x_offset, body_y + 5 - y_offset, 
-                          arm_width, 4, colors["blue"])
-        
-        # Right arm raised and moving
-        right_arm_angle = -math.pi / 3 * laugh_intensity  # -60 degrees * intensity
-        right_arm_length = 30
-        
-        for y in range(right_arm_length):
-            x_offset = int(y * math.sin(right_arm_angle))
-            y_offset = int(y * math.cos(right_arm_angle))
-            
-            draw_rectangle(canvas, body_x + body_width + x_offset, body_y + 5 - y_offset, 
-                          arm_width, 4, colors["blue"])
-        
-        # Hands with slight movement
-        hand_size = 10
-        
-        # Left hand
-        left_hand_x = body_x - arm_width - int(left_arm_length * math.sin(left_arm_angle))
-        left_hand_y = body_y + 5 - int(left_arm_length * math.cos(left_arm_angle))
-        draw_rectangle(canvas, left_hand_x - hand_size, left_hand_y - hand_size // 2, 
-                      hand_size, hand_size, colors["skin"])
-        
-        # Right hand
-        right_hand_x = body_x + body_width + int(right_arm_length * math.sin(right_arm_angle))
-        right_hand_y = body_y + 5 - int(right_arm_length * math.cos(right_arm_angle))
-        draw_rectangle(canvas, right_hand_x, right_hand_y - hand_size // 2, 
-                      hand_size, hand_size, colors["skin"])
-        
-        # Draw legs with slight knee bend for laughing animation
-        leg_width = 10
-        leg_gap = 5
-        
-        # Animation for legs (slight bend at knees)
-        knee_bend = int(3 * laugh_intensity)
-        
-        # Left leg
-        left_leg_x = center_x - leg_width - leg_gap//2
-        left_leg_upper_height = 20 - knee_bend
-        draw_rectangle(canvas, left_leg_x, body_y + body_height - 5, 
-                      leg_width, left_leg_upper_height, colors["dark_gray"])
-        
-        # Left leg lower part (bent at knee)
-        left_leg_lower_x = left_leg_x - knee_bend
-        draw_rectangle(canvas, left_leg_lower_x, body_y + body_height - 5 + left_leg_upper_height, 
-                      leg_width, 35 - left_leg_upper_height, colors["dark_gray"])
-        
-        # Right leg
-        right_leg_x = center_x + leg_gap//2
-        right_leg_upper_height = 20 - knee_bend
-        draw_rectangle(canvas, right_leg_x, body_y + body_height - 5, 
-                      leg_width, right_leg_upper_height, colors["dark_gray"])
-        
-        # Right leg lower part (bent at knee)
-        right_leg_lower_x = right_leg_x + knee_bend
-        draw_rectangle(canvas, right_leg_lower_x, body_y + body_height - 5 + right_leg_upper_height, 
-                      leg_width, 35 - right_leg_upper_height, colors["dark_gray"])
-        
-        # Draw shoes
-        shoe_width = 14
-        shoe_height = 6
-        
-        # Left shoe
-        draw_rectangle(canvas, left_leg_lower_x - 2, 
-                      body_y + body_height - 5 + 35 - 1, 
-                      shoe_width, shoe_height, colors["brown_dark"])
-        
-        # Right shoe
-        draw_rectangle(canvas, right_leg_lower_x - 2, 
-                      body_y + body_height - 5 + 35 - 1, 
-                      shoe_width, shoe_height, colors["brown_dark"])
-        
-        # Add "haha" text bubble for laughing animation (only on certain frames)
-        if frame == 1:
-            laugh_text_x = head_x + head_size + 5
-            laugh_text_y = head_y - 10
-            
-            # Simple speech bubble
-            bubble_width = 30
-            bubble_height = 15
-            
-            # Bubble outline
-            for y in range(-1, bubble_height + 1):
-                for x in range(-1, bubble_width + 1):
-                    if (y == -1 or y == bubble_height or x == -1 or x == bubble_width):
-                        draw_pixel(canvas, laugh_text_x + x, laugh_text_y + y, colors["black"])
-            
-            # Bubble fill
-            for y in range(bubble_height):
-                for x in range(bubble_width):
-                    draw_pixel(canvas, laugh_text_x + x, laugh_text_y + y, colors["white"])
-            
-            # Draw "HA!" text
-            text_pixels = [
-                # H
-                (3, 3), (3, 4), (3, 5), (3, 6), (3, 7),
-                (4, 5),
-                (5, 3), (5, 4), (5, 5), (5, 6), (5, 7),
-                # A
-                (8, 7), (8, 6), (8, 5), (8, 4),
-                (9, 3), (9, 5),
-                (10, 7), (10, 6), (10, 5), (10, 4),
-                # !
-                (13, 3), (13, 4), (13, 5), (13, 7)
-            ]
-            
-            for x, y in text_pixels:
-                draw_pixel(canvas, laugh_text_x + x, laugh_text_y + y, colors["black"])
-        
-        # Add final details
-        add_noise(canvas, 0, 0, size, size, 0.02)
-        
-        frames.append(canvas)
-        
-        # Save this frame
-        save_image(canvas, f"comedian_laughing_{frame+1}.png")
+    def __init__(self, commands=()):
+        self.commands = [_freeze(command) for command in commands]
     
-    return frames
-
-def create_curtain():
-    """Create a detailed theater curtain with folds and texture."""
-    width, height = 256, 512
-    canvas = create_blank_canvas(width, height)
-    
-    # Create a more realistic curtain with deeper folds
-    for x in range(width):
-        for y in range(height):
-            # Create multiple wave patterns for more realistic folds
-            major_fold = 15 * math.sin(y / 60) + 8 * math.sin(y / 30 + 2)
-            minor_fold = 5 * math.sin(y / 15 + x / 40) + 3 * math.sin(y / 8)
-            fold_pattern = major_fold + minor_fold
-            
-            # Calculate distance from center for shadow effect
-            center_distance = abs(x - width / 2) / (width / 2)
-            shadow_factor = center_distance * 0.7  # 0-0.7 range for shadow
-            
-            # Base color
-            color = list(colors["curtain_red"])
-            
-            # Apply fold shading
-            if fold_pattern > 10:
-                # Deep fold (shadow)
-                color = list(colors["curtain_dark"])
-            elif fold_pattern > 5:
-                # Medium fold
-                color = [max(0, c - int(50 * shadow_factor)) for c in color[:3]] + [255]
-            elif fold_pattern < -5:
-                # Highlight
-                color = list(colors["curtain_highlight"])
-                color = [min(255, c + int(30 * (1 - shadow_factor))) for c in color[:3]] + [255]
-            else:
-                # Normal with slight shadow gradient
-                color = [max(0, c - int(30 * shadow_factor)) for c in color[:3]] + [255]
-            
-            draw_pixel(canvas, x, y, tuple(color))
+    def rect(self, x, y, width, height, color):
+        self.commands.append(("rect", color, x, y, width, height))
     
-    # Add curtain top
-    rod_height = 15
-    for y in range(rod_height):
-        for x in range(width):
-            # Rod gradient
-            if y < rod_height // 3:
-                color = colors["light_gray"]
-            elif y < 2 * rod_height // 3:
-                color = colors["gray"]
-            else:
-                color = colors["dark_gray"]
-            
-            # Add highlight
-            if x % 30 < 5 and y < rod_height // 2:
-                color = colors["lighter_gray"]
-                
-            draw_pixel(canvas, x, y, color)
-    
-    # Add curtain ties and details
-    tie_positions = [(30, 100), (40, 250), (50, 400)]
-    for pos_x, pos_y in tie_positions:
-        # Gold/yellow tie rope
-        rope_width, rope_height = 20, 30
-        
-        # Draw fancy rope
-        for y in range(rope_height):
-            rope_curve = 5 * math.sin(y / 5)
-            for x in range(rope_width):
-                dist = abs(x - rope_width / 2 - rope_curve)
-                if dist < 4:
-                    color = colors["gold"] if dist < 2 else colors["yellow_dark"]
-                    draw_pixel(canvas, pos_x + x, pos_y + y, color)
-        
-        # Rope tassel
-        tassel_width, tassel_height = 16, 15
-        for y in range(tassel_height):
-            for x in range(tassel_width):
-                if (x + y) % 4 < 2:  # Create a pattern
-                    draw_pixel(canvas, pos_x + rope_width // 2 - tassel_width // 2 + x, 
-                              pos_y + rope_height + y, colors["gold"])
+    def circle(self, center_x, center_y, radius, color):
+        self.commands.append(("circle", color, center_x, center_y, radius))
+    
+    def ellipse(self, center_x, center_y, radius_x, radius_y, color):
+        self.commands.append(("ellipse", color, center_x, center_y, radius_x, radius_y))
+    
+    def line(self, x1, y1, x2, y2, color):
+        self.commands.append(("line", color, x1, y1, x2, y2))
+    
+    def polygon(self, points, color, antialias=False):
+        self.commands.append(("polygon", color, _freeze([list(point) for point in points]), antialias))
+    
+    def limb(self, x, y, reach_x, reach_y, width, height, color):
+        self.commands.append(("limb", color, x, y, reach_x, reach_y, width, height))
+    
+    def blit(self, layer, x, y, *params):
+        self.commands.append(("blit", layer, x, y, _freeze(list(params))))
+    
+    def outfit(self, x, y, width, height, color_main, color_shadow, color_highlight):
+        """Record the rectangles draw_outfit would draw."""
+        shadow_width = max(2, width // 8)
+        shadow_height = max(2, height // 8)
+        highlight_width = max(2, width // 10)
+        highlight_height = max(2, height // 10)
+        self.rect(x, y, width, height, color_main)
+        self.rect(x, y, shadow_width, height, color_shadow)
+        self.rect(x, y + height - shadow_height, width, shadow_height, color_shadow)
+        self.rect(x + width - highlight_width, y, highlight_width, height - shadow_height, color_highlight)
+        self.rect(x + shadow_width, y, width - shadow_width - highlight_width, highlight_height, color_highlight)
+    
+    def to_json(self):
+        return json.dumps(self.commands, separators=(",", ":"))
     
-    # Save left and right curtains separately
-    left_curtain = canvas.copy()
-    right_curtain = np.flip(canvas, axis=1).copy()
+    @classmethod
+    def from_json(cls, text):
+        return cls(json.loads(text))
     
-    save_image(left_curtain, "curtain_left.png")
-    save_image(right_curtain, "curtain_right.png")
+    def digest(self):
+        """Return a stable hash of the command stream."""
+        return hashlib.sha256(self.to_json().encode()).hexdigest()
     
-    # Also save the full curtain
-    save_image(canvas, "curtain.png")
+    def diff(self, other):
+        """Return the (tag, old commands, new commands) edits that turn this list into other."""
+        matcher = difflib.SequenceMatcher(None, self.commands, other.commands, autojunk=False)
+        return [(tag, self.commands[i0:i1], other.commands[j0:j1])
+                for tag, i0, i1, j0, j1 in matcher.get_opcodes() if tag != "equal"]
     
+    def __len__(self):
+        return len(self.commands)
+    
+    def __eq__(self, other):
+        return isinstance(other, DisplayList) and self.commands == other.commands
+
+def resolve_color(color):
+    """Return the colour value of a command: a colors entry by name, or a literal tuple."""
+    return colors[color] if isinstance(color, str) else color
+
+def command_bounds(command):
+    """Return the half-open (x0, y0, x1, y1) box in base pixels that a command can touch."""
+    op, color, *geometry = command
+    if op == "rect":
+        x, y, width, height = geometry
+        return x, y, x + width, y + height
+    if op == "circle":
+        center_x, center_y, radius = geometry
+        return center_x - radius, center_y - radius, center_x + radius + 1, center_y + radius + 1
+    if op == "ellipse":
+        center_x, center_y, radius_x, radius_y = geometry
+        return center_x - radius_x, center_y - radius_y, center_x + radius_x + 1, center_y + radius_y + 1
+    if op == "line":
+        x1, y1, x2, y2 = geometry
+        return min(x1, x2), min(y1, y2), max(x1, x2) + 1, max(y1, y2) + 1
+    if op == "blit":
+        x, y, params = geometry
+        width, height, origin_x, origin_y = LAYERS[color][1](*params)
+        return x - origin_x, y - origin_y, x - origin_x + width, y - origin_y + height
+    xs, ys = zip(*(geometry[0] if op == "polygon" else limb_outline(*geometry)))
+    return math.floor(min(xs)), math.floor(min(ys)), math.ceil(max(xs)), math.ceil(max(ys))
+
+def _merge_rects(first, second):
+    """Return the (x, y, width, height) union of two rectangles if it is itself a rectangle, else None."""
+    ax0, ay0, ax1, ay1 = first[0], first[1], first[0] + first[2], first[1] + first[3]
+    bx0, by0, bx1, by1 = second[0], second[1], second[0] + second[2], second[1] + second[3]
+    contains = ax0 <= bx0 and ay0 <= by0 and bx1 <= ax1 and by1 <= ay1
+    rows = (ay0, ay1) == (by0, by1) and ax0 <= bx1 and bx0 <= ax1
+    columns = (ax0, ax1) == (bx0, bx1) and ay0 <= by1 and by0 <= ay1
+    if not (contains or rows or columns):
+        return None
+    x0, y0 = min(ax0, bx0), min(ay0, by0)
+    return x0, y0, max(ax1, bx1) - x0, max(ay1, by1) - y0
+
+def optimize(commands, width, height):
+    """Return the commands that still matter on a width x height (base pixel) canvas.
+
+    Rectangles replace the pixels they cover whatever was there, so any
+    command whose box (clipped to the canvas) lies inside a later rectangle
+    never shows and is culled. Rendering the result gives exactly the
+    canvas the full list would.
+    """
+    clipped = []
+    for command in commands:
+        x0, y0, x1, y1 = command_bounds(command)
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+        if x0 >= x1 or y0 >= y1:
+            continue
+        if command[0] == "rect":
+            command = ("rect", command[1], x0, y0, x1 - x0, y1 - y0)
+        clipped.append((command, (x0, y0, x1, y1)))
+    
+    # Walk backwards, so every command is checked against the rectangles drawn after it
+    live, covers = [], []
+    for command, (x0, y0, x1, y1) in reversed(clipped):
+        if any(cx0 <= x0 and cy0 <= y0 and x1 <= cx1 and y1 <= cy1 for cx0, cy0, cx1, cy1 in covers):
+            continue
+        live.append(command)
+        if command[0] == "rect":
+            covers.append((x0, y0, x1, y1))
+    
+    merged = []
+    for command in reversed(live):
+        if merged and command[0] == merged[-1][0] == "rect" and command[1] == merged[-1][1]:
+            union = _merge_rects(merged[-1][2:], command[2:])
+            if union is not None:
+                merged[-1] = ("rect", command[1]) + union
+                continue
+        merged.append(command)
+    return merged
+
+# Kernels of the commands that take (canvas, *geometry, color, scale=...)
+DRAW_KERNELS = {
+    "rect": draw_rectangle,
+    "circle": draw_circle,
+    "ellipse": draw_ellipse,
+    "line": draw_line,
+    "limb": draw_limb,
+}
+
+def execute(commands, canvas, scale=1):
+    """Run display list commands on the canvas, in order."""
+    for op, color, *geometry in commands:
+        if op == "blit":
+            x, y, params = geometry
+            LAYERS[color][0](canvas, x, y, *params, scale=scale)
+        elif op == "polygon":
+            points, antialias = geometry
+            draw_polygon(canvas, points, resolve_color(color), scale, antialias)
+        else:
+            DRAW_KERNELS[op](canvas, *geometry, resolve_color(color), scale=scale)
+
+@functools.lru_cache(maxsize=DISPLAY_LIST_CACHE_SIZE)
+def display_list_canvas(commands, width, height, scale, palette):
+    """Return the cached, read-only render of a command tuple (palette is only part of the key)."""
+    canvas = create_blank_canvas(width * scale, height * scale)
+    execute(commands, canvas, scale)
+    canvas.flags.writeable = False
     return canvas
 
-def create_sample_jokes():
-    """Create an expanded set of dad jokes in JSON format."""
-    jokes = [
-        {"joke": "Why don't scientists trust atoms?", "punchline": False},
+def render_display_list(display_list, width, height, scale=1):
+    """Optimize and render a display list onto a new width x height (base pixel) canvas.
+
+    Frames whose optimized command streams are identical render only once.
+    """
+    commands = tuple(optimize(display_list.commands, width, height))
+    return display_list_canvas(commands, width, height, scale, palette_key()).copy()
+
+# =========================
+# FRAME RENDERING JOBS
+# =========================
+
+# A render job is a (filename, renderer, args) tuple. Renderers are plain
+# module-level functions returning a canvas, so they can run in worker processes.
+
+def frame_executor(jobs=1):
+    """Return a process pool for jobs > 1, or a no-op context for serial rendering."""
+    if jobs > 1:
+        return ProcessPoolExecutor(max_workers=jobs)
+    return contextlib.nullcontext()
+
+def render_jobs(jobs, executor=None):
+    """Render each job and return the canvases in job order.
+
+    With an executor every job is submitted up front, so frames render in
+    parallel; the order of the results never depends on which finishes first.
+    """
+    if executor is None:
+        return [renderer(*args) for _, renderer, args in jobs]
+    futures = [executor.submit(renderer, *args) for _, renderer, args in jobs]
+    return [future.result() for future in futures]
+
+def bounded_map(executor, func, items, lookahead):
+    """Yield func(item) for each item in order, like executor.map but lazily.
+
+    At most lookahead items are submitted and not yet yielded, so a long or
+    endless iterable of items never piles up results in memory.
+    """
+    pending = collections.deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= lookahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _render_job(job):
+    """Render one job, returning (filename, canvas)."""
+    filename, renderer, args = job
+    return filename, renderer(*args)
+
+def iter_render_jobs(jobs, executor=None, lookahead=None):
+    """Yield (filename, canvas) for each job in order, rendering lazily.
+
+    Without an executor each frame renders only when it is requested. With
+    one, at most lookahead jobs (by default two per CPU) are in flight, so
+    memory stays flat however many frames there are.
+    """
+    if executor is None:
+        return map(_render_job, jobs)
+    return bounded_map(executor, _render_job, jobs, lookahead or 2 * (os.cpu_count() or 1))
+
+def render_frames(jobs, executor=None):
+    """Render each job and return (filename, canvas) pairs in job order, ready for a sink."""
+    return [(filename, canvas) for (filename, _, _), canvas in zip(jobs, render_jobs(jobs, executor))]
+
+# =========================
+# CHARACTER RIG
+# =========================
+
+# The comedian is a rig of parts (torso, head, bow tie, arms, legs, shoes...)
+# declared in comedian_rig.json, and each animation is a loop of keyframe
+# poses in the same file. A pose sets channels per part, such as an arm's
+# angle and length or a leg's offset and knee bend; channels a keyframe
+# leaves out take the animation's pose, then the part's own defaults.
+# Numeric channels are interpolated for every frame in one vectorized step
+# (linearly, or along a looping Catmull-Rom spline for "smooth"), while
+# strings and flags hold until the next keyframe. Sampling a cycle with as
+# many frames as it has keyframes reproduces the keyframes exactly, and any
+# other frame count gives in-betweens, so new animations and frame rates
+# need only new JSON.
+#
+# Part coordinates are base pixels relative to the root, the top centre of
+# the head at (size // 2, size // 4), or to the end point of their parent
+# part (a shoe hangs off its leg). Arm angles are degrees from straight
+# down, positive outwards.
+
+RIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "comedian_rig.json")
+
+@functools.cache
+def _read_rig(path):
+    with open(path) as f:
+        return json.load(f)
+
+def load_rig(path=RIG_FILE):
+    """Load a character rig and its animations from JSON.
+
+    Each file is read on first use and cached for the rest of the process,
+    so later renders and in-memory builds do no file I/O. Every call
+    returns a fresh copy the caller may edit.
+    """
+    return copy.deepcopy(_read_rig(path))
+
+def keyframe_poses(rig, animation):
+    """Return every keyframe of an animation as a complete {part: {channel: value}} pose."""
+    spec = rig["animations"][animation]
+    defaults = {"root": {"x": 0, "y": 0}}
+    defaults.update({part["name"]: dict(part.get("pose", {})) for part in rig["parts"]})
+    poses = []
+    for keyframe in spec["keyframes"]:
+        pose = {name: dict(channels) for name, channels in defaults.items()}
+        for layer in (spec.get("pose", {}), keyframe):
+            for name, channels in layer.items():
+                pose[name].update(channels)
+        poses.append(pose)
+    return poses
+
+def compile_animation(rig, animation, num_frames=None, frames=None):
+    """Return the interpolated pose of each frame of an animation cycle.
+
+    num_frames defaults to the animation's own frame count, and frames picks
+    which of them to return (all by default).
+    """
+    spec = rig["animations"][animation]
+    keyframes = keyframe_poses(rig, animation)
+    num_frames = num_frames or spec["frames"]
+    frames = np.arange(num_frames) if frames is None else np.asarray(frames)
+    
+    # Cycle position of every frame, in keyframes
+    count = len(keyframes)
+    position = frames * count / num_frames
+    index = np.floor(position).astype(np.intp) % count
+    t = (position - np.floor(position))[:, np.newaxis]
+    
+    channels = [(name, channel) for name, values in keyframes[0].items() for channel in values
+                if all(isinstance(pose[name].get(channel), (int, float)) and not isinstance(pose[name][channel], bool)
+                       for pose in keyframes)]
+    values = np.array([[pose[name][channel] for name, channel in channels] for pose in keyframes],
+                      dtype=np.float64).reshape(count, len(channels))
+    p1, p2 = values[index], values[(index + 1) % count]
+    if spec.get("interpolation", "linear") == "smooth":
+        p0, p3 = values[(index - 1) % count], values[(index + 2) % count]
+        sampled = 0.5 * (2 * p1 + (p2 - p0) * t + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t**2
+                         + (3 * p1 - p0 - 3 * p2 + p3) * t**3)
+    else:
+        sampled = p1 + (p2 - p1) * t
+    
+    poses = []
+    for key, row in zip(index.tolist(), sampled.tolist()):
+        pose = {name: dict(channels) for name, channels in keyframes[key].items()}
+        for (name, channel), value in zip(channels, row):
+            pose[name][channel] = value
+        poses.append(pose)
+    return poses
+
+# Part drawers record one part into a display list, with the part placed at
+# (x, y), and return the end point child parts hang off (or None)
+
+def record_suit(display, part, pose, x, y):
+    """Record the cached suit layer."""
+    display.blit("suit", x, y, part["width"], part["height"])
+
+def record_head(display, part, pose, x, y):
+    """Record the face and hair layers, both turned to the pose's facing."""
+    display.blit("face", x, y, pose["expression"], pose["facing"], (24, 26))
+    display.blit("hair", x, y, part["hair"], pose["facing"])
+
+def record_bow_tie(display, part, pose, x, y):
+    """Record the cached bow tie layer centred on the part position."""
+    display.blit("bow_tie", x, y, part["size"])
+
+def record_clasped_arms(display, part, pose, x, y):
+    """Record both arms hanging behind the back with the hands clasped below them."""
+    color, width, gap = part["color"], part["arm_width"], part["gap"]
+    for arm_x in (x - gap // 2 - width, x + gap // 2):
+        display.outfit(arm_x, y, width, part["arm_height"], color, f"{color}_dark", f"{color}_light")
+    display.rect(x - part["hand_width"] // 2, y + part["hand_y"], part["hand_width"], part["hand_height"], "skin")
+
+def record_arm(display, part, pose, x, y):
+    """Record an arm swept from the shoulder, an optional forearm and the hand."""
+    side = part["side"]
+    segments = [(pose["angle"], pose["length"]), (pose["forearm_angle"], pose["forearm_length"])]
+    for angle, length in segments:
+        if length <= 0:
+            continue
+        angle = math.radians(angle)
+        display.limb(x, y, side * (length - 1) * math.sin(angle), (length - 1) * math.cos(angle),
+                     part["width"], part["thickness"], part["color"])
+        x, y = x + int(side * length * math.sin(angle)), y + int(length * math.cos(angle))
+    display.rect(x + round(pose["hand_x"]), y + round(pose["hand_y"]), part["hand_size"], part["hand_size"], "skin")
+    return x, y
+
+def record_leg(display, part, pose, x, y):
+    """Record a leg bent outwards at the knee; it ends at the foot."""
+    x += round(pose["offset"])
+    bend = round(pose["bend"])
+    upper = part["knee"] - bend
+    display.rect(x, y, part["width"], upper, part["color"])
+    x += part["side"] * bend
+    display.rect(x, y + upper, part["width"], part["length"] - upper, part["color"])
+    return x, y + part["length"]
+
+def record_shoe(display, part, pose, x, y):
+    """Record a shoe, placed relative to the foot of its parent leg."""
+    display.rect(x, y, part["width"], part["height"], part["color"])
+
+def record_bubble(display, part, pose, x, y):
+    """Record a speech bubble with its pixel lettering."""
+    display.rect(x - 1, y - 1, part["width"] + 2, part["height"] + 2, "black")
+    display.rect(x, y, part["width"], part["height"], "white")
+    for pixel_x, pixel_y in part["pixels"]:
+        display.rect(x + pixel_x, y + pixel_y, 1, 1, "black")
+
+PART_KINDS = {
+    "suit": record_suit,
+    "head": record_head,
+    "bow_tie": record_bow_tie,
+    "clasped_arms": record_clasped_arms,
+    "arm": record_arm,
+    "leg": record_leg,
+    "shoe": record_shoe,
+    "bubble": record_bubble,
+}
+
+def pose_display_list(rig, pose, size=CHAR_SIZE):
+    """Record the rig in a pose, part by part in rig order. Hidden parts and their children are skipped."""
+    display = DisplayList()
+    ends = {"root": (size // 2 + round(pose["root"]["x"]), size // 4 + round(pose["root"]["y"]))}
+    for part in rig["parts"]:
+        parent = ends.get(part.get("parent", "root"))
+        if parent is None or not pose[part["name"]].get("visible", True):
+            continue
+        end = PART_KINDS[part["kind"]](display, part, pose[part["name"]], parent[0] + part["x"], parent[1] + part["y"])
+        if end is not None:
+            ends[part["name"]] = end
+    return display
+
+def render_rig_frame(animation, frame, num_frames=None, size=CHAR_SIZE, seed=NOISE_SEED, scale=SCALE,
+                     mode=SCALE_MODE, rig=None):
+    """Render one frame of a rig animation (from comedian_rig.json unless rig is given)."""
+    if rig is None:
+        rig = load_rig()
+    if mode == "nearest" and scale > 1:
+        return upscale_nearest(render_rig_frame(animation, frame, num_frames, size, seed, rig=rig), scale)
+    pose, = compile_animation(rig, animation, num_frames, [frame])
+    canvas = render_display_list(pose_display_list(rig, pose, size), size, size, scale)
+    
+    # Add final details
+    add_noise(canvas, 0, 0, size, size, rig["noise"], frame_rng(f"comedian_{animation}", frame, seed), scale=scale)
+    
+    return canvas
+
+def rig_frame_jobs(animation, num_frames=None, size=CHAR_SIZE, seed=NOISE_SEED, scale=SCALE, mode=SCALE_MODE,
+                   rig=None):
+    """List the render jobs for one rig animation.
+
+    The whole rig travels with every job, so it is part of each frame's
+    input hash: any edit to the JSON rebuilds every frame rendered from it.
+    """
+    if rig is None:
+        rig = load_rig()
+    num_frames = num_frames or rig["animations"][animation]["frames"]
+    return [(f"comedian_{animation}_{frame+1}.png", render_rig_frame,
+             (animation, frame, num_frames, size, seed, scale, mode, rig))
+            for frame in range(num_frames)]
+
+# =========================
+# CHARACTER ANIMATIONS
+# =========================
+
+def create_animation_frames(frame_jobs, *args, executor=None, indexed=False):
+    """Render the jobs frame_jobs(*args) lists and return their canvases in order.
+
+    With indexed set the frames are palette-index canvases (see indexed_colors).
+    """
+    jobs = frame_jobs(*args)
+    return render_jobs(indexed_jobs(jobs) if indexed else jobs, executor)
+
+def iter_animation_frames(frame_jobs, *args, executor=None, indexed=False):
+    """Yield (filename, canvas) for the jobs frame_jobs(*args) lists, one frame at a time.
+
+    Frames render as they are consumed, so feeding this to write_frames
+    keeps memory flat for animations of any length.
+    """
+    jobs = frame_jobs(*args)
+    return iter_render_jobs(indexed_jobs(jobs) if indexed else jobs, executor)
+
+def pacing_frame_jobs(size=CHAR_SIZE, num_frames=4, seed=NOISE_SEED, scale=SCALE, mode=SCALE_MODE):
+    """List the render jobs for both pacing directions, right first."""
+    rig = load_rig()
+    return [job for direction in ("right", "left")
+            for job in rig_frame_jobs(f"pacing_{direction}", num_frames, size, seed, scale, mode, rig)]
+
+def talking_frame_jobs(size=CHAR_SIZE, num_frames=3, seed=NOISE_SEED, scale=SCALE, mode=SCALE_MODE):
+    """List the render jobs for the talking animation."""
+    return rig_frame_jobs("talking", num_frames, size, seed, scale, mode)
+
+def laughing_frame_jobs(size=CHAR_SIZE, num_frames=3, seed=NOISE_SEED, scale=SCALE, mode=SCALE_MODE):
+    """List the render jobs for the laughing animation."""
+    return rig_frame_jobs("laughing", num_frames, size, seed, scale, mode)
+
+# Named entry points for each animation, see create_animation_frames and iter_animation_frames
+
+def create_pacing_frames(size=CHAR_SIZE, num_frames=4, seed=NOISE_SEED, executor=None,
+                         scale=SCALE, mode=SCALE_MODE, indexed=False):
+    """Create the pacing frames, returned as (right, left) lists of canvases."""
+    frames = create_animation_frames(pacing_frame_jobs, size, num_frames, seed, scale, mode,
+                                     executor=executor, indexed=indexed)
+    return frames[:num_frames], frames[num_frames:]
+
+def iter_pacing_frames(size=CHAR_SIZE, num_frames=4, seed=NOISE_SEED, executor=None,
+                       scale=SCALE, mode=SCALE_MODE, indexed=False):
+    """Yield (filename, canvas) pacing frames one at a time, right direction first."""
+    return iter_animation_frames(pacing_frame_jobs, size, num_frames, seed, scale, mode,
+                                 executor=executor, indexed=indexed)
+
+def create_talking_frames(size=CHAR_SIZE, num_frames=3, seed=NOISE_SEED, executor=None,
+                          scale=SCALE, mode=SCALE_MODE, indexed=False):
+    """Create the talking frames as a list of canvases."""
+    return create_animation_frames(talking_frame_jobs, size, num_frames, seed, scale, mode,
+                                   executor=executor, indexed=indexed)
+
+def iter_talking_frames(size=CHAR_SIZE, num_frames=3, seed=NOISE_SEED, executor=None,
+                        scale=SCALE, mode=SCALE_MODE, indexed=False):
+    """Yield (filename, canvas) talking frames one at a time."""
+    return iter_animation_frames(talking_frame_jobs, size, num_frames, seed, scale, mode,
+                                 executor=executor, indexed=indexed)
+
+def create_laughing_frames(size=CHAR_SIZE, num_frames=3, seed=NOISE_SEED, executor=None,
+                           scale=SCALE, mode=SCALE_MODE, indexed=False):
+    """Create the laughing frames as a list of canvases."""
+    return create_animation_frames(laughing_frame_jobs, size, num_frames, seed, scale, mode,
+                                   executor=executor, indexed=indexed)
+
+def iter_laughing_frames(size=CHAR_SIZE, num_frames=3, seed=NOISE_SEED, executor=None,
+                         scale=SCALE, mode=SCALE_MODE, indexed=False):
+    """Yield (filename, canvas) laughing frames one at a time."""
+    return iter_animation_frames(laughing_frame_jobs, size, num_frames, seed, scale, mode,
+                                 executor=executor, indexed=indexed)
+
+def render_curtain(width=256, height=512, scale=SCALE, mode=SCALE_MODE):
+    """Render a detailed theater curtain with folds and texture.
+
+    Every pass is computed over the whole grid at once, so tall curtains for
+    large screens cost milliseconds rather than a per-pixel Python loop.
+    """
+    if mode == "nearest" and scale > 1:
+        return upscale_nearest(render_curtain(width, height), scale)
+    canvas = create_blank_canvas(width * scale, height * scale)
+    y, x = sample_grid(height, width, scale)
+    
+    # Create multiple wave patterns for more realistic folds. Only the
+    # sin(y / 15 + x / 40) term depends on both axes; expanding it with the
+    # angle-sum identity leaves a couple of multiply-adds per pixel.
+    major_fold = 15 * np.sin(y / 60) + 8 * np.sin(y / 30 + 2)
+    row_fold = major_fold + 3 * np.sin(y / 8)
+    fold_pattern = np.sin(y / 15) * np.cos(x / 40)
+    fold_pattern += np.cos(y / 15) * np.sin(x / 40)
+    fold_pattern *= 5
+    fold_pattern += row_fold
+    
+    # Calculate distance from center for shadow effect (one value per column)
+    center_distance = np.abs(x[0] - width / 2) / (width / 2)
+    shadow_factor = (center_distance * 0.7)[:, np.newaxis]  # 0-0.7 range for shadow
+    
+    base = np.array(colors["curtain_red"], dtype=np.int32)
+    highlight = np.array(colors["curtain_highlight"], dtype=np.int32)
+    rgb = np.array([1, 1, 1, 0])
+    
+    # Per-column RGBA for each fold band, packed into one uint32 per pixel
+    def packed(column_colors):
+        return np.ascontiguousarray(column_colors, dtype=np.uint8).view(np.uint32)[:, 0]
+    
+    deep = packed(np.array([colors["curtain_dark"]]))
+    medium = packed(np.maximum(0, base - rgb * (50 * shadow_factor).astype(np.int32)))
+    lit = packed(np.minimum(255, highlight + rgb * (30 * (1 - shadow_factor)).astype(np.int32)))
+    normal = packed(np.maximum(0, base - rgb * (30 * shadow_factor).astype(np.int32)))
+    
+    canvas.view(np.uint32)[..., 0] = np.select(
+        [fold_pattern > 10, fold_pattern > 5, fold_pattern < -5],  # deep fold, medium fold, highlight
+        [deep, medium, lit],
+        normal,  # normal with slight shadow gradient
+    )
+    
+    # Add curtain top
+    rod_height = 15
+    rod = canvas[:rod_height * scale]
+    rod_y, rod_x = sample_grid(rod_height, width, scale)
+    rod_y = rod_y[:rod.shape[0]]
+    
+    # Rod gradient
+    rod[...] = colors["dark_gray"]
+    rod[rod_y[:, 0] < 2 * rod_height // 3] = colors["gray"]
+    rod[rod_y[:, 0] < rod_height // 3] = colors["light_gray"]
+    
+    # Add highlight
+    rod[(rod_x % 30 < 5) & (rod_y < rod_height // 2)] = colors["lighter_gray"]
+    
+    # Add curtain ties and details, spaced down the curtain in proportion to its size
+    tie_positions = [(30 * width // 256, 100 * height // 512),
+                     (40 * width // 256, 250 * height // 512),
+                     (50 * width // 256, 400 * height // 512)]
+    
+    # Gold/yellow tie rope
+    rope_width, rope_height = 20, 30
+    rope_y, rope_x = sample_grid(rope_height, rope_width, scale)
+    rope_curve = 5 * np.sin(rope_y / 5)
+    dist = np.abs(rope_x - rope_width / 2 - rope_curve)
+    rope_core = dist < 2
+    rope_edge = (dist < 4) & ~rope_core
+    
+    # Rope tassel pattern
+    tassel_width, tassel_height = 16, 15
+    tassel_y, tassel_x = sample_grid(tassel_height, tassel_width, scale)
+    tassel = (tassel_x + tassel_y) % 4 < 2
+    
+    for pos_x, pos_y in tie_positions:
+        fill_mask(canvas, pos_x * scale, pos_y * scale, rope_core, colors["gold"])
+        fill_mask(canvas, pos_x * scale, pos_y * scale, rope_edge, colors["yellow_dark"])
+        fill_mask(canvas, (pos_x + rope_width // 2 - tassel_width // 2) * scale,
+                  (pos_y + rope_height) * scale, tassel, colors["gold"])
+    
+    return canvas
+
+def create_curtain(width=256, height=512, scale=SCALE, mode=SCALE_MODE):
+    """Create a detailed theater curtain with folds and texture."""
+    return render_curtain(width, height, scale, mode)
+
+def render_curtain_side(side, width=256, height=512, scale=SCALE, mode=SCALE_MODE):
+    """Render the curtain image saved for one side: "left", "right" or "full"."""
+    canvas = render_curtain(width, height, scale, mode)
+    if side == "right":
+        return np.flip(canvas, axis=1).copy()
+    return canvas
+
+def curtain_jobs(width=256, height=512, scale=SCALE, mode=SCALE_MODE):
+    """List one render job per curtain image, so each can be cached on its own."""
+    return [("curtain_left.png", render_curtain_side, ("left", width, height, scale, mode)),
+            ("curtain_right.png", render_curtain_side, ("right", width, height, scale, mode)),
+            ("curtain.png", render_curtain_side, ("full", width, height, scale, mode))]
+
+def create_sample_jokes():
+    """Create an expanded set of dad jokes in JSON format."""
+    jokes = [
+        {"joke": "Why don't scientists trust atoms?", "punchline": False},
         {"joke": "Because they make up everything!", "punchline": True},
         
         {"joke": "Did you hear about the mathematician who's afraid of negative numbers?", "punchline": False},
@@ -1097,38 +1601,1248 @@ def create_sample_jokes():
         {"joke": "I see food and I eat it!", "punchline": True}
     ]
     
-    with open(os.path.join(output_dir, "dadJokes.json"), "w") as f:
-        json.dump(jokes, f, indent=2)
+    return jokes
+
+# =========================
+# SPRITE ATLAS
+# =========================
+
+ATLAS_NAME = "comedian_atlas"
+FRAME_DURATION_MS = 150  # Matches frameRate in script-dev.js
+
+def pack_atlas(frames, padding=1, max_width=None):
+    """Shelf-pack named canvases into a single atlas canvas.
+
+    frames is a list of (name, canvas) pairs. Frames are placed tallest first
+    in rows no wider than max_width (by default roughly the square root of
+    the total area). Returns the atlas and a dict of name -> (x, y, w, h).
+    """
+    if max_width is None:
+        area = sum((c.shape[1] + padding) * (c.shape[0] + padding) for _, c in frames)
+        max_width = max(int(math.ceil(math.sqrt(area))), max(c.shape[1] for _, c in frames))
+    
+    rects = {}
+    x = y = shelf_height = atlas_width = 0
+    for name, canvas in sorted(frames, key=lambda f: -f[1].shape[0]):
+        height, width = canvas.shape[:2]
+        # Start a new shelf when this frame would overflow the row
+        if x > 0 and x + width > max_width:
+            x, y, shelf_height = 0, y + shelf_height + padding, 0
+        rects[name] = (x, y, width, height)
+        atlas_width = max(atlas_width, x + width)
+        shelf_height = max(shelf_height, height)
+        x += width + padding
+    
+    # Index frames pack into an index atlas, RGBA frames into an RGBA one
+    atlas = np.zeros((y + shelf_height, atlas_width) + frames[0][1].shape[2:], dtype=np.uint8)
+    for name, canvas in frames:
+        x, y, width, height = rects[name]
+        atlas[y:y + height, x:x + width] = canvas
+    return atlas, rects
+
+def trim_canvas(canvas):
+    """Crop a canvas to the bounding box of its visible pixels.
+
+    Returns the cropped canvas and the (x, y) offset of the crop within the
+    original. A fully transparent canvas trims to a single pixel.
+    """
+    visible = canvas != 0 if canvas.ndim == 2 else canvas[..., 3] > 0
+    ys, xs = np.flatnonzero(visible.any(axis=1)), np.flatnonzero(visible.any(axis=0))
+    if not len(ys):
+        return canvas[:1, :1], (0, 0)
+    return canvas[ys[0]:ys[-1] + 1, xs[0]:xs[-1] + 1], (int(xs[0]), int(ys[0]))
+
+def create_atlas(frames, padding=1, trim=True, duration_ms=FRAME_DURATION_MS):
+    """Pack (filename, canvas) frames into the sprite atlas and build its JSON index.
+
+    Frames are grouped into animations by filename (comedian_talking_2.png
+    belongs to comedian_talking). Each frame records its rectangle and a
+    bottom-centre anchor where the feet meet the stage; each animation
+    records its frame order and duration.
+
+    With trim set each frame is cropped to its visible pixels first. Its
+    entry then also records the untrimmed source size and the offset of the
+    crop within it, and the anchor moves with the crop so the feet stay put.
+    Identical trimmed frames are packed once and share a rectangle.
+    """
+    named = []
+    for filename, canvas in frames:
+        source_height, source_width = canvas.shape[:2]
+        offset = (0, 0)
+        if trim:
+            canvas, offset = trim_canvas(canvas)
+        named.append((os.path.splitext(filename)[0], canvas, offset, (source_width, source_height)))
+    
+    # Pack each distinct canvas once
+    unique = {}
+    for name, canvas, _, _ in named:
+        unique.setdefault((canvas.shape, canvas.tobytes()), (name, canvas))
+    atlas, rects = pack_atlas(list(unique.values()), padding)
+    
+    index = {
+        "image": f"{ATLAS_NAME}.png",
+        "size": {"w": atlas.shape[1], "h": atlas.shape[0]},
+        "frames": {},
+        "animations": {},
+    }
+    for name, canvas, (offset_x, offset_y), (source_width, source_height) in named:
+        x, y, width, height = rects[unique[canvas.shape, canvas.tobytes()][0]]
+        frame = {"x": x, "y": y, "w": width, "h": height,
+                 "anchor": {"x": source_width // 2 - offset_x, "y": source_height - offset_y}}
+        if trim:
+            frame["offset"] = {"x": offset_x, "y": offset_y}
+            frame["source"] = {"w": source_width, "h": source_height}
+        index["frames"][name] = frame
+        animation = index["animations"].setdefault(
+            animation_name(name), {"frame_duration_ms": duration_ms, "frames": []})
+        animation["frames"].append(name)
+    
+    return atlas, index
+
+def write_atlas(sink, atlas, index):
+    """Write a packed atlas and its index to a sink."""
+    sink.write_image(index["image"], atlas)
+    sink.write_json(f"{ATLAS_NAME}.json", index)
+
+def animation_name(filename):
+    """Return the animation a frame belongs to (comedian_talking_2.png -> comedian_talking)."""
+    return os.path.splitext(filename)[0].rsplit("_", 1)[0]
+
+# =========================
+# FRAME DELTAS
+# =========================
+
+# Consecutive frames differ in only a few places (legs while pacing, arms
+# and mouth while talking), so a client that keeps the previous frame on
+# screen only needs to blit the dirty rectangles of the next one.
+
+DELTAS_NAME = "comedian_deltas"
+DIRTY_TILE = 8  # Grid size, in pixels, that changed pixels are grouped on
+
+def changed_pixels(previous, current):
+    """Return a 2D mask of the pixels that differ between two canvases."""
+    changed = previous != current
+    return changed.any(axis=2) if changed.ndim == 3 else changed
+
+def dirty_rects(previous, current, tile=DIRTY_TILE):
+    """Return tight (x, y, w, h) rectangles covering every pixel that changed.
+
+    Changed pixels are marked on a tile grid; runs of dirty tiles in each
+    grid row are merged with identical runs in the rows below, and each
+    resulting rectangle is shrunk to the changed pixels inside it. Separate
+    moving parts therefore get separate rectangles rather than one box
+    spanning both.
+    """
+    changed = changed_pixels(previous, current)
+    height, width = changed.shape
+    rows, cols = -(-height // tile), -(-width // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:height, :width] = changed
+    dirty = padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+    
+    spans = []  # (first tile column, last tile column + 1, first tile row, last tile row + 1)
+    open_spans = {}
+    for row in range(rows + 1):
+        edges = np.diff(np.concatenate(([0], dirty[row] if row < rows else np.zeros(cols), [0])).astype(np.int8))
+        runs = list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+        still_open = {run: open_spans.pop(run, row) for run in runs}
+        spans += [(x0, x1, y0, row) for (x0, x1), y0 in open_spans.items()]
+        open_spans = still_open
+    
+    rects = []
+    for x0, x1, y0, y1 in spans:
+        region = changed[y0 * tile:y1 * tile, x0 * tile:x1 * tile]
+        ys, xs = np.flatnonzero(region.any(axis=1)), np.flatnonzero(region.any(axis=0))
+        rects.append((int(x0 * tile + xs[0]), int(y0 * tile + ys[0]),
+                      int(xs[-1] - xs[0] + 1), int(ys[-1] - ys[0] + 1)))
+    return sorted(rects, key=lambda rect: (rect[1], rect[0]))
+
+def create_frame_deltas(frames, tile=DIRTY_TILE):
+    """Build the dirty-rectangle index for (filename, canvas) frames.
+
+    Each frame records the rectangles that changed since the previous
+    frame of its animation; the first frame is compared with the last, as
+    the animations loop. Sizes are in raw pixel bytes (4 per RGBA pixel,
+    1 per palette index) so a client can see what a partial blit saves.
+    """
+    index = {"tile": tile, "animations": {}}
+    for name, named in group_animations(frames, named=True).items():
+        frame_bytes = named[0][1].nbytes
+        pixel_bytes = named[0][1][0, 0].nbytes
+        entries = []
+        for position, (filename, canvas) in enumerate(named):
+            rects = dirty_rects(named[position - 1][1], canvas, tile)
+            entries.append({"name": os.path.splitext(filename)[0], "rects": [list(rect) for rect in rects],
+                            "dirty_bytes": sum(w * h for _, _, w, h in rects) * pixel_bytes})
+        dirty_total = sum(entry["dirty_bytes"] for entry in entries)
+        index["animations"][name] = {
+            "frame_bytes": frame_bytes,
+            "mean_dirty_bytes": round(dirty_total / len(entries)),
+            "saving": round(1 - dirty_total / (frame_bytes * len(entries)), 3),
+            "frames": entries,
+        }
+    return index
+
+# =========================
+# ANIMATED EXPORT
+# =========================
+
+# Each animation cycle can also be written as a single looping APNG, WebP
+# or GIF, so the page can show one image instead of swapping frame elements
+# on a timer. Frames after the first only store what changed.
+
+ANIMATION_FORMATS = {"apng": "apng", "webp": "webp", "gif": "gif"}  # format -> file extension
+
+APNG_BLEND_SOURCE = 0
+APNG_BLEND_OVER = 1
+
+def group_animations(frames, named=False):
+    """Group (filename, canvas) frames into an ordered dict of animation name -> canvases.
+
+    With named set each animation lists the (filename, canvas) pairs instead.
+    """
+    animations = {}
+    for filename, canvas in frames:
+        animations.setdefault(animation_name(filename), []).append((filename, canvas) if named else canvas)
+    return animations
+
+def _png_chunk(kind, body):
+    """Serialise one PNG chunk with its length and CRC."""
+    return len(body).to_bytes(4, "big") + kind + body + zlib.crc32(kind + body).to_bytes(4, "big")
+
+def _png_chunks(data):
+    """Split encoded PNG bytes into (type, body) chunks."""
+    chunks = []
+    pos = 8  # Skip the signature
+    while pos < len(data):
+        length = int.from_bytes(data[pos:pos + 4], "big")
+        chunks.append((data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]))
+        pos += 12 + length
+    return chunks
+
+def delta_frames(canvases, duration_ms=FRAME_DURATION_MS):
+    """Reduce frames to the changed rectangles between consecutive frames.
+
+    Returns (x, y, canvas, blend, duration_ms) tuples. The first frame is
+    whole. Later frames are cropped to the bounding box of the pixels that
+    changed; when every changed pixel is opaque the unchanged ones inside
+    the box are made transparent and the frame is blended over the
+    previous one, which compresses far better. Frames identical to their
+    predecessor just extend its duration.
+    """
+    lut = palette_lut()
+    deltas = [[0, 0, canvases[0], APNG_BLEND_SOURCE, duration_ms]]
+    for previous, current in zip(canvases, canvases[1:]):
+        changed = changed_pixels(previous, current)
+        if not changed.any():
+            deltas[-1][4] += duration_ms
+            continue
+        rows, cols = np.nonzero(changed)
+        y0, y1, x0, x1 = rows.min(), rows.max() + 1, cols.min(), cols.max() + 1
+        region = current[y0:y1, x0:x1].copy()
+        region_changed = changed[y0:y1, x0:x1]
+        alpha = lut[region][..., 3] if region.ndim == 2 else region[..., 3]
+        if (alpha[region_changed] == 255).all():
+            region[~region_changed] = 0  # Transparent (index 0 on palette canvases)
+            blend = APNG_BLEND_OVER
+        else:
+            blend = APNG_BLEND_SOURCE
+        deltas.append([int(x0), int(y0), region, blend, duration_ms])
+    return [tuple(delta) for delta in deltas]
+
+def encode_apng(canvases, duration_ms=FRAME_DURATION_MS, loop=0, compress_level=PNG_COMPRESS_LEVEL):
+    """Encode frames as a looping APNG whose later frames are delta rectangles.
+
+    Every frame region is encoded by encode_png, so palette-index canvases
+    give a palette APNG sharing one PLTE/tRNS. loop 0 repeats forever.
+    """
+    deltas = delta_frames(canvases, duration_ms)
+    header = _png_chunks(encode_png(deltas[0][2], compress_level))
+    height, width = canvases[0].shape[:2]
+    out = [b"\x89PNG\r\n\x1a\n", _png_chunk(b"IHDR", header[0][1]),
+           _png_chunk(b"acTL", len(deltas).to_bytes(4, "big") + loop.to_bytes(4, "big"))]
+    out += [_png_chunk(kind, body) for kind, body in header[1:] if kind in (b"PLTE", b"tRNS")]
+    
+    sequence = 0
+    for index, (x, y, region, blend, duration) in enumerate(deltas):
+        region_height, region_width = region.shape[:2]
+        out.append(_png_chunk(b"fcTL", b"".join([
+            sequence.to_bytes(4, "big"), region_width.to_bytes(4, "big"), region_height.to_bytes(4, "big"),
+            x.to_bytes(4, "big"), y.to_bytes(4, "big"),
+            duration.to_bytes(2, "big"), (1000).to_bytes(2, "big"),  # delay in milliseconds
+            bytes([0, blend]),  # dispose op: none
+        ])))
+        sequence += 1
+        chunks = header if index == 0 else _png_chunks(encode_png(region, compress_level))
+        for kind, body in chunks:
+            if kind != b"IDAT":
+                continue
+            if index == 0:
+                out.append(_png_chunk(b"IDAT", body))
+            else:
+                out.append(_png_chunk(b"fdAT", sequence.to_bytes(4, "big") + body))
+                sequence += 1
+    out.append(_png_chunk(b"IEND", b""))
+    return b"".join(out)
+
+def gif_frame(canvas):
+    """Convert a canvas to a GIF-ready palette image with index 0 transparent.
+
+    GIF has a single transparent index rather than per-entry alpha, so RGBA
+    canvases are quantized to 255 colours and shifted up one index.
+    """
+    if canvas.ndim == 2:
+        img = palette_image(canvas, palette_lut())
+        img.info["transparency"] = 0
+        return img
+    quantized = Image.fromarray(canvas[..., :3]).quantize(255, method=Image.Quantize.FASTOCTREE)
+    indices = np.asarray(quantized, dtype=np.uint8) + 1
+    indices[canvas[..., 3] == 0] = 0
+    rgb = np.asarray(quantized.getpalette()[:255 * 3], dtype=np.uint8)
+    img = Image.fromarray(indices)
+    img.putpalette(bytes(3) + rgb.tobytes())
+    img.info["transparency"] = 0
+    return img
+
+def encode_animation(canvases, fmt="apng", duration_ms=FRAME_DURATION_MS, loop=0):
+    """Encode one animation cycle as APNG, lossless WebP or GIF bytes.
+
+    WebP and GIF rely on their encoders' own frame differencing (libwebp's
+    sub-frame rectangles and Pillow's GIF bounding boxes). GIF has one-bit
+    transparency and at most 256 colours, so it is only exact for
+    palette-index canvases; noisy RGBA frames are quantized.
+    """
+    if fmt == "apng":
+        return encode_apng(canvases, duration_ms, loop)
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        images = [Image.fromarray(to_rgba(canvas)) for canvas in canvases]
+        images[0].save(buffer, format="WEBP", save_all=True, append_images=images[1:],
+                       duration=duration_ms, loop=loop, lossless=True, exact=True, quality=100, method=4)
+    elif fmt == "gif":
+        images = [gif_frame(canvas) for canvas in canvases]
+        images[0].save(buffer, format="GIF", save_all=True, append_images=images[1:],
+                       duration=duration_ms, loop=loop, disposal=2, optimize=True)
+    else:
+        raise ValueError(f"unknown animation format {fmt!r}")
+    return buffer.getvalue()
+
+def export_animations(sink, frames, formats=("apng",), duration_ms=FRAME_DURATION_MS):
+    """Write every animation in (filename, canvas) frames to a sink in each format.
+
+    Files are named after the animation, e.g. comedian_talking.apng.
+    Returns the filenames written.
+    """
+    written = []
+    for name, canvases in group_animations(frames).items():
+        for fmt in formats:
+            filename = f"{name}.{ANIMATION_FORMATS[fmt]}"
+            sink.write_bytes(filename, encode_animation(canvases, fmt, duration_ms))
+            written.append(filename)
+    return written
+
+# =========================
+# OUTPUT SINKS
+# =========================
+
+# Rendering functions return canvases and never write anything; a sink decides
+# where finished images and JSON files go. Every sink has write_image,
+# write_json and close, and is a context manager. Sinks that can read their
+# outputs back (exists, read_image, read_json) also support incremental builds.
+
+class Sink:
+    """Base sink: a write-only destination that keeps nothing to read back."""
+    
+    def write_image(self, filename, canvas):
+        raise NotImplementedError
+    
+    def write_bytes(self, filename, data):
+        """Write an already encoded file, such as an animation."""
+        raise NotImplementedError
+    
+    def write_images(self, frames):
+        """Write a batch of (filename, canvas) pairs."""
+        for filename, canvas in frames:
+            self.write_image(filename, canvas)
+    
+    def write_json(self, filename, data):
+        raise NotImplementedError
+    
+    def exists(self, filename):
+        return False
+    
+    def resolve(self, filename):
+        """Return the filename an image is actually stored under."""
+        return filename
+    
+    def read_image(self, filename):
+        raise KeyError(filename)
+    
+    def read_indices(self, filename):
+        """Read an image drawn only with palette colours back as a palette-index canvas."""
+        return index_canvas(self.read_image(filename))
+    
+    def read_json(self, filename):
+        raise KeyError(filename)
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PNGSink(Sink):
+    """Base for sinks that store encoded PNGs.
+
+    Batches are encoded and stored on a thread pool, since Pillow releases
+    the GIL while compressing. report records the bytes and encode time of
+    every image written.
+    """
+    
+    def __init__(self, compress_level=PNG_COMPRESS_LEVEL, quantize=False, threads=PNG_WRITE_THREADS):
+        self.compress_level = compress_level
+        self.quantize = quantize
+        self.threads = threads
+        self.report = []
+    
+    def store(self, filename, data):
+        raise NotImplementedError
+    
+    def _encode_and_store(self, frame):
+        filename, canvas = frame
+        start = time.perf_counter()
+        data = encode_png(canvas, self.compress_level, self.quantize)
+        encode_ms = (time.perf_counter() - start) * 1000
+        self.store(filename, data)
+        return {"file": filename, "bytes": len(data), "encode_ms": round(encode_ms, 3)}
+    
+    def write_image(self, filename, canvas):
+        self.write_images([(filename, canvas)])
+    
+    def write_images(self, frames):
+        """Encode and store (filename, canvas) pairs from any iterable, including a generator.
+
+        Only a couple of frames per thread are held at once, so streaming a
+        long animation through the sink keeps memory flat.
+        """
+        if self.threads > 1:
+            with ThreadPoolExecutor(self.threads) as pool:
+                for entry in bounded_map(pool, self._encode_and_store, frames, 2 * self.threads):
+                    self.written(entry)
+        else:
+            for frame in frames:
+                self.written(self._encode_and_store(frame))
+    
+    def written(self, entry):
+        """Record the report entry of an image that has been stored."""
+        self.report.append(entry)
+    
+    def write_bytes(self, filename, data):
+        self.store(filename, data)
+    
+    def report_totals(self):
+        """Return the image count, total bytes and total encode time so far."""
+        return {"images": len(self.report),
+                "bytes": sum(entry["bytes"] for entry in self.report),
+                "encode_ms": round(sum(entry["encode_ms"] for entry in self.report), 3)}
+
+class DiskSink(PNGSink):
+    """Write PNGs and JSON files into a directory, creating it on first write."""
+    
+    def __init__(self, directory=None, verbose=True, **encoding):
+        super().__init__(**encoding)
+        self.directory = directory or output_dir
+        self.verbose = verbose
+    
+    def _path(self, filename):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, filename)
+    
+    def store(self, filename, data):
+        with open(self._path(filename), "wb") as f:
+            f.write(data)
+    
+    def written(self, entry):
+        super().written(entry)
+        if self.verbose:
+            print(f"Saved {entry['file']} ({entry['bytes']:,} bytes, {entry['encode_ms']:.1f} ms)")
+    
+    def write_bytes(self, filename, data):
+        self.store(filename, data)
+        if self.verbose:
+            print(f"Saved {filename} ({len(data):,} bytes)")
+    
+    def write_json(self, filename, data):
+        with open(self._path(filename), "w") as f:
+            json.dump(data, f, indent=2)
+        if self.verbose:
+            print(f"Saved {filename}")
+    
+    def exists(self, filename):
+        return os.path.exists(os.path.join(self.directory, filename))
+    
+    def read_image(self, filename):
+        return load_image(filename, self.directory)
+    
+    def read_json(self, filename):
+        with open(os.path.join(self.directory, filename)) as f:
+            return json.load(f)
+    
+    def __str__(self):
+        return os.path.abspath(self.directory)
+
+class MemorySink(Sink):
+    """Keep outputs in a filename -> canvas, JSON data or bytes dict, with no file I/O."""
+    
+    def __init__(self):
+        self.files = {}
+    
+    def write_image(self, filename, canvas):
+        self.files[filename] = canvas
+    
+    def write_json(self, filename, data):
+        self.files[filename] = data
+    
+    def write_bytes(self, filename, data):
+        self.files[filename] = data
+    
+    def exists(self, filename):
+        return filename in self.files
+    
+    def read_image(self, filename):
+        return self.files[filename]
+    
+    def read_json(self, filename):
+        return self.files[filename]
+    
+    def __str__(self):
+        return f"memory ({len(self.files)} files)"
+
+class ArchiveSink(PNGSink):
+    """Write outputs into a zip archive at a path or an open binary file object.
+
+    PNGs are stored as they are, since they are already compressed. The
+    archive is write-only, so every build into it is a full build.
+    """
+    
+    def __init__(self, file, **encoding):
+        super().__init__(**encoding)
+        self.file = file
+        self.archive = zipfile.ZipFile(file, "w")
+        self.lock = threading.Lock()
+    
+    def store(self, filename, data):
+        with self.lock:
+            self.archive.writestr(filename, data, zipfile.ZIP_STORED)
+    
+    def write_json(self, filename, data):
+        with self.lock:
+            self.archive.writestr(filename, json.dumps(data, indent=2), zipfile.ZIP_DEFLATED)
+    
+    def close(self):
+        self.archive.close()
+    
+    def __str__(self):
+        return str(self.file) if isinstance(self.file, str) else "zip archive"
+
+class AtlasSink(Sink):
+    """Collect images and, on close, pack them into the sprite atlas in another sink.
+
+    JSON and encoded files pass straight through. Closing also closes the wrapped sink.
+    """
+    
+    def __init__(self, sink, padding=1):
+        self.sink = sink
+        self.padding = padding
+        self.frames = []
+    
+    def write_image(self, filename, canvas):
+        self.frames.append((filename, canvas))
+    
+    def write_json(self, filename, data):
+        self.sink.write_json(filename, data)
+    
+    def write_bytes(self, filename, data):
+        self.sink.write_bytes(filename, data)
+    
+    def close(self):
+        if self.frames:
+            write_atlas(self.sink, *create_atlas(self.frames, self.padding))
+            self.frames = []
+        self.sink.close()
+    
+    def __str__(self):
+        return f"atlas in {self.sink}"
+
+def write_frames(sink, frames):
+    """Write (filename, canvas) pairs to a sink as one batch.
+
+    frames may be a generator such as iter_talking_frames(), which streams
+    frames into the sink one at a time.
+    """
+    sink.write_images(frames)
+
+# =========================
+# FRAME DEDUPLICATION
+# =========================
+
+# Frames that come out identical (or, with a tolerance, identical apart
+# from add_noise jitter) are stored once; the other filenames become
+# aliases of the stored file, listed in ALIASES_FILE.
+
+ALIASES_FILE = "frame_aliases.json"
+DEDUPE_TOLERANCE = 24  # Per-channel difference that noise jitter stays within, nearly always
+DEDUPE_MAX_CHANGED = 0.005  # Share of visible pixels allowed to differ in clusters
+
+def frame_digest(canvas):
+    """Hash a canvas's shape and pixels."""
+    return hashlib.sha256(str(canvas.shape).encode() + canvas.tobytes()).hexdigest()
+
+def frames_match(first, second, tolerance=DEDUPE_TOLERANCE):
+    """Check whether two frames differ by no more than texture-noise jitter.
+
+    Both frames must have the same visible pixels. A pixel counts as
+    changed when a colour channel differs by more than tolerance and at
+    least two of its eight neighbours do too: jitter gives isolated
+    speckles, while a moved limb or mouth changes whole runs of pixels.
+    Up to DEDUPE_MAX_CHANGED of the visible pixels may change, which
+    absorbs the rare clumps of in-palette dither.
+    """
+    if first.shape[:2] != second.shape[:2]:
+        return False
+    first, second = (to_rgba(canvas) if canvas.ndim == 2 else canvas for canvas in (first, second))
+    visible = first[..., 3] > 0
+    if (visible != (second[..., 3] > 0)).any():
+        return False
+    differs = np.abs(first[..., :3].astype(np.int16) - second[..., :3]).max(axis=2) > tolerance
+    height, width = differs.shape
+    padded = np.pad(differs, 1).astype(np.uint8)
+    neighbourhood = sum(padded[dy:dy + height, dx:dx + width] for dy in range(3) for dx in range(3))
+    changed = np.count_nonzero(differs & (neighbourhood >= 3))
+    return changed <= DEDUPE_MAX_CHANGED * np.count_nonzero(visible)
+
+class DedupeSink(Sink):
+    """Store each distinct image once in another sink and alias the duplicates.
+
+    Images are matched by a hash of their pixels or, with a tolerance, by
+    frames_match. The aliases (alias -> stored filename) and the digests
+    of stored images are written to ALIASES_FILE in the wrapped sink for
+    clients to resolve frame names with, and are reloaded by the next
+    build. Reads and exists() resolve aliases. When a stored image is
+    rewritten with different pixels, its old pixels move to one of its
+    aliases first. JSON and encoded files pass straight through. Closing
+    also closes the wrapped sink.
+    """
+    
+    def __init__(self, sink, tolerance=None):
+        self.sink = sink
+        self.tolerance = tolerance
+        try:
+            state = sink.read_json(ALIASES_FILE)
+        except (OSError, ValueError, KeyError):
+            state = {}
+        self.aliases = state.get("aliases", {})
+        self.stored = state.get("stored", {})  # filename -> frame_digest of its pixels
+        self.canvases = {}  # Stored images kept for tolerance matching
+    
+    def resolve(self, filename):
+        return self.aliases.get(filename, filename)
+    
+    def _canvas(self, filename):
+        if filename in self.canvases:
+            return self.canvases[filename]
+        canvas = self.sink.read_image(filename)
+        if self.tolerance is not None:
+            self.canvases[filename] = canvas
+        return canvas
+    
+    def _find(self, canvas, digest):
+        """Return the stored filename canvas duplicates, or None."""
+        for filename, stored_digest in self.stored.items():
+            if stored_digest == digest:
+                return filename
+        if self.tolerance is not None:
+            for filename in self.stored:
+                if frames_match(self._canvas(filename), canvas, self.tolerance):
+                    return filename
+        return None
+    
+    def _release(self, filename):
+        """Detach a filename about to get new pixels, moving its old image to an alias if needed."""
+        self.aliases.pop(filename, None)
+        if filename not in self.stored:
+            return
+        dependents = [alias for alias, target in self.aliases.items() if target == filename]
+        if dependents:
+            keeper = dependents[0]
+            canvas = self._canvas(filename)
+            self.sink.write_image(keeper, canvas)
+            self.stored[keeper] = self.stored[filename]
+            if self.tolerance is not None:
+                self.canvases[keeper] = canvas
+            del self.aliases[keeper]
+            for alias in dependents[1:]:
+                self.aliases[alias] = keeper
+        del self.stored[filename]
+        self.canvases.pop(filename, None)
+    
+    def _unique(self, frames):
+        """Yield the frames that are not duplicates, recording aliases for the rest."""
+        for filename, canvas in frames:
+            digest = frame_digest(canvas)
+            if self.stored.get(filename) == digest:
+                yield filename, canvas
+                continue
+            self._release(filename)
+            match = self._find(canvas, digest)
+            if match is not None:
+                self.aliases[filename] = match
+                continue
+            self.stored[filename] = digest
+            if self.tolerance is not None:
+                self.canvases[filename] = canvas
+            yield filename, canvas
+    
+    def write_image(self, filename, canvas):
+        self.write_images([(filename, canvas)])
+    
+    def write_images(self, frames):
+        self.sink.write_images(self._unique(frames))
+    
+    def write_json(self, filename, data):
+        self.sink.write_json(filename, data)
     
-    print("Created expanded dad jokes JSON file with multiple joke formats")
+    def write_bytes(self, filename, data):
+        self.sink.write_bytes(filename, data)
+    
+    def exists(self, filename):
+        return self.sink.exists(self.resolve(filename))
+    
+    def read_image(self, filename):
+        return self.sink.read_image(self.resolve(filename))
+    
+    def read_indices(self, filename):
+        return self.sink.read_indices(self.resolve(filename))
+    
+    def read_json(self, filename):
+        return self.sink.read_json(filename)
+    
+    def close(self):
+        self.sink.write_json(ALIASES_FILE, {"aliases": dict(sorted(self.aliases.items())),
+                                            "stored": dict(sorted(self.stored.items()))})
+        self.sink.close()
+    
+    def __str__(self):
+        return str(self.sink)
+
+# =========================
+# CAST VARIANTS
+# =========================
+
+# A cast is a list of variant specs, each one a differently dressed comedian:
+#   {"name": "dapper", "palette": "tuxedo", "suit": [r, g, b], "hair": "full",
+#    "colors": {"brown": [r, g, b, a]}}
+# Everything but the name is optional. Only the hair style changes any
+# geometry, so each style in the cast is rendered once, as palette-index
+# frames packed into one index atlas, and a variant is nothing more than a
+# lookup table over those indices. All variants of a style are recoloured
+# together in one fancy-indexing pass, or, for sinks that store PNGs,
+# written as palette PNGs of the shared indices without expanding to RGBA.
+
+CAST_NAME = "comedian_cast"
+CAST_BATCH = 64  # Variants recoloured to RGBA at once, bounding the memory of one pass
+
+def shade_ramp(rgb, name="blue"):
+    """Return colors overrides rebasing a shade ramp (name, _dark, _light, _highlight) on one colour."""
+    rgb = np.asarray(rgb[:3], dtype=np.float64)
+    shades = {name: rgb, f"{name}_dark": rgb * 0.65,
+              f"{name}_light": rgb + (255 - rgb) * 0.3, f"{name}_highlight": rgb + (255 - rgb) * 0.45}
+    return {shade: tuple(np.rint(value).astype(int).tolist()) + (255,) for shade, value in shades.items()}
+
+def variant_lut(spec):
+    """Return the (N, 4) RGBA lookup table of a variant spec.
+
+    The spec's palette applies first, then its suit colour (as the blue
+    ramp) and finally its individual colors.
+    """
+    overrides = shade_ramp(spec["suit"]) if "suit" in spec else {}
+    overrides.update({name: tuple(value) for name, value in spec.get("colors", {}).items()})
+    unknown = set(overrides) - set(PALETTE_NAMES)
+    if unknown:
+        raise ValueError(f"variant {spec['name']!r} overrides unknown colours {sorted(unknown)}")
+    return palette_lut(spec.get("palette"), overrides)
+
+def recolor(indices, luts):
+    """Map a palette-index canvas through one (N, 4) lookup table or a (V, N, 4) stack of them.
+
+    A stack adds a leading variant axis to the result, every variant coming
+    out of the same single indexing pass.
+    """
+    return luts[indices] if luts.ndim == 2 else luts[:, indices]
+
+def hair_rig(hair, rig):
+    """Return a copy of the rig whose heads all wear the given hair style."""
+    return dict(rig, parts=[dict(part, hair=hair) if part["kind"] == "head" else part for part in rig["parts"]])
+
+def create_cast(specs, scale=SCALE, mode=SCALE_MODE, trim=True, rig=None, executor=None):
+    """Render a cast of variant specs, yielding (hair, atlas, index, names, luts) per hair style.
+
+    atlas is the palette-index atlas every variant of the style shares and
+    index its JSON index (without an image, since each variant has its
+    own). luts stacks the variants' lookup tables in the order of names.
+    """
+    if rig is None:
+        rig = load_rig()
+    groups = {}
+    for spec in specs:
+        hair = spec.get("hair", "comedian")
+        if hair not in HAIR_STYLES:
+            raise ValueError(f"variant {spec['name']!r} has unknown hair style {hair!r}")
+        groups.setdefault(hair, []).append(spec)
+    names = [spec["name"] for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError("variant names must be unique")
+    
+    for hair, group in groups.items():
+        styled = hair_rig(hair, rig)
+        jobs = [job for name in styled["animations"]
+                for job in rig_frame_jobs(name, None, CHAR_SIZE, NOISE_SEED, scale, mode, styled)]
+        atlas, index = create_atlas(render_frames(indexed_jobs(jobs), executor), trim=trim)
+        del index["image"]
+        yield hair, atlas, index, [spec["name"] for spec in group], np.stack([variant_lut(spec) for spec in group])
+
+def write_cast(sink, groups):
+    """Write create_cast groups to a sink: an atlas per variant, an index per hair style and the cast index.
+
+    PNG sinks get palette PNGs encoded straight from the shared index atlas
+    through each variant's LUT, on the sink's threads; other sinks get RGBA
+    atlases recoloured CAST_BATCH variants at a time.
+    """
+    cast = {"variants": {}}
+    for hair, atlas, index, names, luts in groups:
+        index_file = f"{CAST_NAME}_hair_{hair}.json"
+        sink.write_json(index_file, index)
+        filenames = [f"{CAST_NAME}_{name}.png" for name in names]
+        if isinstance(sink, PNGSink):
+            with ThreadPoolExecutor(sink.threads) as pool:
+                encoded = bounded_map(pool, lambda lut: encode_png(atlas, sink.compress_level, lut=lut), luts,
+                                      2 * sink.threads)
+                for filename, data in zip(filenames, encoded):
+                    sink.write_bytes(filename, data)
+        else:
+            for start in range(0, len(luts), CAST_BATCH):
+                batch = slice(start, start + CAST_BATCH)
+                sink.write_images(zip(filenames[batch], recolor(atlas, luts[batch])))
+        for filename, name in zip(filenames, names):
+            cast["variants"][name] = {"image": filename, "atlas": index_file, "hair": hair}
+    sink.write_json(f"{CAST_NAME}.json", cast)
+    return cast
+
+# =========================
+# PALETTE SWAPS
+# =========================
+
+# Index frames hold colors keys (as palette indices) rather than colours, so
+# recolouring a finished render needs no drawing at all: build the lookup
+# table of the new colours and send the frames through it. Frames of an
+# indexed build can be read back from their sink and recoloured into any
+# palette in a single fancy-indexing pass over the stacked frames or, for
+# sinks that store PNGs, written as palette PNGs of the unchanged indices
+# with the new table as their palette.
+
+def ramp_swaps(source, target):
+    """Return swaps moving each shade of one colour ramp (name, _dark, _light, _highlight) to another's."""
+    return {f"{source}{shade}": f"{target}{shade}" for shade in ("", "_dark", "_light", "_highlight")
+            if f"{source}{shade}" in PALETTE_NAMES and f"{target}{shade}" in PALETTE_NAMES}
+
+def swap_lut(palette=None, swaps=None):
+    """Return the (N, 4) RGBA lookup table of a PALETTES variant with individual colours swapped.
+
+    swaps maps colors names to an RGBA value or to another colors name,
+    whose colour in the palette they take on.
+    """
+    swaps = swaps or {}
+    unknown = {key for item in swaps.items() for key in item if isinstance(key, str)} - set(PALETTE_NAMES)
+    if unknown:
+        raise ValueError(f"unknown colours {sorted(unknown)}")
+    base = palette_lut(palette)
+    return palette_lut(palette, {name: tuple(base[PALETTE_NAMES.index(value)]) if isinstance(value, str)
+                                 else tuple(value) for name, value in swaps.items()})
+
+def recolor_frames(frames, palette=None, swaps=None):
+    """Recolour (filename, palette-index canvas) pairs to RGBA through swap_lut(palette, swaps).
+
+    Nothing is drawn. Frames of one shape are stacked, so the whole set
+    goes through the lookup table in one indexing pass.
+    """
+    frames = list(frames)
+    lut = swap_lut(palette, swaps)
+    canvases = [canvas for _, canvas in frames]
+    if len({canvas.shape for canvas in canvases}) == 1:
+        canvases = recolor(np.stack(canvases), lut)
+    else:
+        canvases = [recolor(canvas, lut) for canvas in canvases]
+    return [(filename, canvas) for (filename, _), canvas in zip(frames, canvases)]
+
+def read_index_frames(sink, filenames):
+    """Read frames of an indexed build back from a sink as (filename, palette-index canvas) pairs."""
+    return [(filename, sink.read_indices(filename)) for filename in filenames]
+
+def palette_filename(filename, palette):
+    """Return the filename of a frame's copy in a recoloured frame set."""
+    return f"{palette}_{filename}"
+
+def write_palette_frames(sink, frames, palettes):
+    """Write a copy of (filename, palette-index canvas) pairs recoloured into each of PALETTES named.
+
+    PNG sinks get palette PNGs of the shared indices with each palette's
+    lookup table, encoded on the sink's threads; other sinks get RGBA
+    frames from recolor_frames.
+    """
+    frames = list(frames)
+    for palette in palettes:
+        if isinstance(sink, PNGSink):
+            lut = swap_lut(palette)
+            with ThreadPoolExecutor(sink.threads) as pool:
+                encoded = bounded_map(pool, lambda frame: encode_png(frame[1], sink.compress_level, lut=lut), frames,
+                                      2 * sink.threads)
+                for (filename, _), data in zip(frames, encoded):
+                    sink.write_bytes(palette_filename(filename, palette), data)
+        else:
+            sink.write_images((palette_filename(filename, palette), canvas)
+                              for filename, canvas in recolor_frames(frames, palette))
+
+# =========================
+# INCREMENTAL BUILD CACHE
+# =========================
+
+MANIFEST_FILE = "build_manifest.json"
+
+def _code_names(code):
+    """Yield every global name used by a code object, including nested functions."""
+    yield from code.co_names
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            yield from _code_names(const)
+
+@functools.cache
+def _own_source(func):
+    """Return the source of one module function, or of every method of a class.
+
+    Classes are read method by method, since getsource on a class parses
+    the whole module.
+    """
+    if not inspect.isclass(func):
+        return inspect.getsource(func)
+    methods = [getattr(member, "__func__", member) for member in vars(func).values()]
+    return func.__qualname__ + "".join(inspect.getsource(method) for method in methods if inspect.isfunction(method))
+
+@functools.cache
+def _direct_helpers(func):
+    """Return the module functions and classes func (or any method of a class) refers to by name."""
+    if inspect.isclass(func):
+        methods = [getattr(member, "__func__", member) for member in vars(func).values()]
+        codes = [method.__code__ for method in methods if inspect.isfunction(method)]
+    else:
+        codes = [func.__code__]
+    names = sorted({name for code in codes for name in _code_names(code)})
+    return tuple(helper for name in names for helper in _module_helpers(globals().get(name)))
+
+@functools.cache
+def source_fingerprint(func):
+    """Hash the source of func and of every module function or class it uses, transitively.
+
+    A class counts with all of its methods, and a cached function with the
+    function it wraps. Module code never changes while it runs, so each
+    fingerprint is computed once per process.
+    """
+    used = {func}
+    pending = [func]
+    while pending:
+        for helper in _direct_helpers(pending.pop()):
+            if helper not in used:
+                used.add(helper)
+                pending.append(helper)
+    digest = hashlib.sha256(_own_source(func).encode())
+    for helper in sorted(used - {func}, key=lambda helper: helper.__qualname__):
+        digest.update(_own_source(helper).encode())
+    return digest.hexdigest()
+
+def _module_helpers(value):
+    """Yield the module functions and classes a global refers to, looking inside dicts and tuples."""
+    if isinstance(value, dict):
+        value = tuple(value.values())
+    if isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _module_helpers(item)
+    elif callable(value):
+        value = inspect.unwrap(value)
+        if ((inspect.isfunction(value) or inspect.isclass(value)) and value.__module__ == __name__
+                and value.__name__ != "<lambda>"):
+            yield value
+
+def input_hash(func, args=(), encoding=None):
+    """Hash everything an output depends on: code, parameters, palette, size, seed and encoding."""
+    bound = inspect.signature(func).bind(*args)
+    bound.apply_defaults()
+    inputs = {
+        "function": func.__name__,
+        "source": source_fingerprint(func),
+        "parameters": bound.arguments,
+        "colors": colors,
+        "char_size": CHAR_SIZE,
+        "noise_seed": NOISE_SEED,
+        "encoding": encoding,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=_hash_value).encode()).hexdigest()
+
+def _hash_value(value):
+    """Describe a non-JSON input stably: functions by their source fingerprint."""
+    if inspect.isfunction(value):
+        return source_fingerprint(value)
+    return repr(value)
+
+def load_manifest(sink):
+    """Load the build manifest mapping each output filename to its input hash."""
+    try:
+        return sink.read_json(MANIFEST_FILE)
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def save_manifest(sink, manifest):
+    """Write the build manifest next to the assets."""
+    sink.write_json(MANIFEST_FILE, dict(sorted(manifest.items())))
+
+def is_up_to_date(manifest, sink, filename, digest):
+    """Check whether an output exists in the sink and was built from the same inputs."""
+    return manifest.get(filename) == digest and sink.exists(filename)
 
 # Generate all assets
-def generate_all_assets():
-    """Generate all assets for the improved comedian animation."""
-    print("Generating enhanced pixel art comedian assets with multi-frame animations...")
+def generate_all_assets(jobs=1, force=False, scale=SCALE, mode=SCALE_MODE, sink=None, verbose=True,
+                        indexed=False, animations=(), trim=True, dedupe=False, dedupe_tolerance=None, fps=None,
+                        cast=None, palettes=()):
+    """Generate all assets for the improved comedian animation.
+
+    With jobs > 1 every frame and the curtain render in a pool of worker
+    processes. Each frame has its own seeded noise, so the output is the
+    same for any number of jobs. scale and mode select the output
+    resolution and how it is rasterized (see SCALE_MODES). With indexed
+    set the character frames and atlas are rendered as palette indices and
+    written as palette PNGs, with the texture noise dithered in-palette.
+    Atlas frames are trimmed to their visible pixels unless trim is
+    cleared. The changed rectangles between consecutive frames are
+    indexed in comedian_deltas.json (see create_frame_deltas). animations
+    names formats from ANIMATION_FORMATS in which every animation cycle is
+    also exported as a single looping file.
+
+    Every animation in comedian_rig.json is rendered, at its own frame
+    count by default. With fps set each cycle keeps its length in time and
+    is resampled to that frame rate instead, with interpolated in-betweens.
+    cast is a list of variant specs to render as well (see create_cast).
+    palettes names PALETTES variants to write a copy of every character
+    frame in, as {palette}_{frame}.png. The copies are recoloured from the
+    index frames rather than re-rendered (see write_palette_frames), so
+    they need indexed set.
+
+    With dedupe set, frames with identical pixels are written once and the
+    rest are aliased in frame_aliases.json (see DedupeSink); a
+    dedupe_tolerance also merges frames differing only by noise jitter.
+
+    Outputs go to sink, a DiskSink on output_dir by default; pass a
+    MemorySink to build without any file I/O. Outputs whose inputs are
+    unchanged since the last build (according to the manifest in the sink)
+    are skipped unless force is set. The sink is closed and returned.
+    """
+    log = print if verbose else lambda *args: None
+    if fps is not None and not fps > 0:
+        raise ValueError(f"fps must be positive, not {fps}")
+    if palettes and not indexed:
+        raise ValueError("palette frame sets are recoloured from index frames, so they need indexed set")
+    unknown = set(palettes) - set(PALETTES)
+    if unknown:
+        raise ValueError(f"unknown palettes {sorted(unknown)}")
+    if sink is None:
+        sink = DiskSink(verbose=verbose)
+    log("Generating enhanced pixel art comedian assets with multi-frame animations...")
+    
+    encoding = {"compress_level": sink.compress_level, "quantize": sink.quantize} if isinstance(sink, PNGSink) else None
+    output = sink
+    if dedupe or dedupe_tolerance is not None:
+        # Dedupe settings decide which files exist, so they count as encoding
+        encoding = dict(encoding or {}, dedupe_tolerance=dedupe_tolerance)
+        output = DedupeSink(sink, dedupe_tolerance)
+    
+    manifest = {} if force else load_manifest(output)
+    
+    rig = load_rig()
+    duration_ms = FRAME_DURATION_MS if fps is None else max(1, round(1000 / fps))
+    character_jobs = [job for name, spec in rig["animations"].items()
+                      for job in rig_frame_jobs(name, max(1, round(spec["frames"] * FRAME_DURATION_MS / duration_ms)),
+                                                CHAR_SIZE, scale=scale, mode=mode, rig=rig)]
+    if indexed:
+        character_jobs = indexed_jobs(character_jobs)
+    all_jobs = character_jobs + curtain_jobs(scale=scale, mode=mode)
+    digests = {filename: input_hash(renderer, args, encoding) for filename, renderer, args in all_jobs}
+    stale_jobs = [job for job in all_jobs if not is_up_to_date(manifest, output, job[0], digests[job[0]])]
+    
+    # Render everything up front so all frames can run in parallel
+    log(f"\nRendering {len(stale_jobs)} changed images ({len(all_jobs) - len(stale_jobs)} up to date)...")
+    rendered = {}
+    if stale_jobs:
+        with frame_executor(jobs) as executor:
+            frames = render_frames(stale_jobs, executor)
+        write_frames(output, frames)
+        for filename, canvas in frames:
+            manifest[filename] = digests[filename]
+            rendered[filename] = canvas
     
-    # Generate pacing animation frames (4 frames each direction)
-    print("\nGenerating pacing animation frames...")
-    create_pacing_frames(CHAR_SIZE, 4)
+    # Pack the character frames into the sprite atlas and index their dirty rectangles,
+    # reusing unchanged frames from the sink
+    atlas_digest = hashlib.sha256("".join(
+        [source_fingerprint(create_atlas), str(trim), str(duration_ms)]
+        + [digests[filename] for filename, _, _ in character_jobs]
+    ).encode()).hexdigest()
+    atlas_files = (f"{ATLAS_NAME}.png", f"{ATLAS_NAME}.json")
+    stale_atlas = not all(is_up_to_date(manifest, output, filename, atlas_digest) for filename in atlas_files)
+    deltas_digest = hashlib.sha256("".join(
+        [source_fingerprint(create_frame_deltas)] + [digests[filename] for filename, _, _ in character_jobs]
+    ).encode()).hexdigest()
+    stale_deltas = not is_up_to_date(manifest, output, f"{DELTAS_NAME}.json", deltas_digest)
     
-    # Generate talking animation frames (3 frames)
-    print("\nGenerating talking animation frames...")
-    create_talking_frames(CHAR_SIZE, 3)
+    # One animated file per animation and format, digested from the frames it holds
+    frame_names = {}
+    for filename, _, _ in character_jobs:
+        frame_names.setdefault(animation_name(filename), []).append(filename)
+    animation_digests = {
+        f"{name}.{ANIMATION_FORMATS[fmt]}": hashlib.sha256("".join(
+            [source_fingerprint(encode_animation), fmt, str(duration_ms)] + [digests[filename] for filename in filenames]
+        ).encode()).hexdigest()
+        for name, filenames in frame_names.items() for fmt in animations
+    }
+    stale_animations = [filename for filename, digest in animation_digests.items()
+                        if not is_up_to_date(manifest, output, filename, digest)]
     
-    # Generate laughing animation frames (3 frames)
-    print("\nGenerating laughing animation frames...")
-    create_laughing_frames(CHAR_SIZE, 3)
+    # One recoloured copy per frame and palette, digested from the frame and the palette's colours
+    palette_digests = {
+        palette_filename(filename, palette): hashlib.sha256("".join(
+            [source_fingerprint(write_palette_frames), swap_lut(palette).tobytes().hex(), digests[filename]]
+        ).encode()).hexdigest()
+        for palette in palettes for filename, _, _ in character_jobs
+    }
+    stale_palette_frames = [filename for filename, digest in palette_digests.items()
+                            if not is_up_to_date(manifest, output, filename, digest)]
     
-    # Generate environment assets
-    print("\nGenerating environment assets...")
-    create_curtain()
+    if stale_atlas or stale_deltas or stale_animations or stale_palette_frames:
+        stored = [output.resolve(filename) for filename, _, _ in character_jobs]
+        read = output.read_indices if indexed else output.read_image
+        frames = [(filename, rendered[source] if source in rendered else read(source))
+                  for (filename, _, _), source in zip(character_jobs, stored)]
+    if stale_atlas:
+        log("\nPacking sprite atlas...")
+        write_atlas(output, *create_atlas(frames, trim=trim, duration_ms=duration_ms))
+        for filename in atlas_files:
+            manifest[filename] = atlas_digest
+    if stale_deltas:
+        log("\nFinding dirty rectangles between frames...")
+        output.write_json(f"{DELTAS_NAME}.json", create_frame_deltas(frames))
+        manifest[f"{DELTAS_NAME}.json"] = deltas_digest
+    if stale_animations:
+        log("\nEncoding animations...")
+        for name, canvases in group_animations(frames).items():
+            for fmt in animations:
+                filename = f"{name}.{ANIMATION_FORMATS[fmt]}"
+                if filename in stale_animations:
+                    output.write_bytes(filename, encode_animation(canvases, fmt, duration_ms))
+                    manifest[filename] = animation_digests[filename]
+    
+    if stale_palette_frames:
+        log(f"\nRecolouring {len(stale_palette_frames)} frames into {', '.join(palettes)}...")
+        # Recoloured copies go to the sink itself, like the cast, so every palette has a full frame set
+        for palette in palettes:
+            write_palette_frames(sink, [frame for frame in frames
+                                        if palette_filename(frame[0], palette) in stale_palette_frames], [palette])
+        for filename in stale_palette_frames:
+            manifest[filename] = palette_digests[filename]
     
     # Generate the jokes
-    print("\nGenerating joke content...")
-    create_sample_jokes()
+    jokes_digest = input_hash(create_sample_jokes)
+    if not is_up_to_date(manifest, output, "dadJokes.json", jokes_digest):
+        log("\nGenerating joke content...")
+        output.write_json("dadJokes.json", create_sample_jokes())
+        manifest["dadJokes.json"] = jokes_digest
+    
+    if cast:
+        cast_digest = hashlib.sha256((input_hash(create_cast, (cast, scale, mode, trim, rig), encoding)
+                                      + source_fingerprint(write_cast)).encode()).hexdigest()
+        if not is_up_to_date(manifest, output, f"{CAST_NAME}.json", cast_digest):
+            log(f"\nRendering a cast of {len(cast)} variants...")
+            # Variant atlases differ by construction, so they bypass any dedupe wrapper
+            with frame_executor(jobs) as executor:
+                write_cast(sink, create_cast(cast, scale, mode, trim, rig, executor))
+            manifest[f"{CAST_NAME}.json"] = cast_digest
     
-    print("\nAll enhanced assets generated successfully!")
-    print(f"Assets saved to: {os.path.abspath(output_dir)}")
+    save_manifest(output, manifest)
+    output.close()
+    
+    if isinstance(sink, PNGSink) and sink.report:
+        totals = sink.report_totals()
+        log(f"\nEncoded {totals['images']} images: {totals['bytes']:,} bytes, "
+            f"{totals['encode_ms']:.1f} ms encode time")
+    log("\nAll enhanced assets generated successfully!")
+    log(f"Assets saved to: {sink}")
+    return sink
+
+def positive_float(text):
+    """argparse type for a number that must be greater than zero."""
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"must be positive, not {text}")
+    return value
 
 if __name__ == "__main__":
-    generate_all_assets()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the pixel art comedian assets.")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes for frame rendering (0 uses every CPU)")
+    parser.add_argument("--force", action="store_true",
+                        help="regenerate every asset even if the build manifest says it is up to date")
+    parser.add_argument("--scale", type=int, default=SCALE,
+                        help="integer output scale for high-DPI sprites")
+    parser.add_argument("--scale-mode", choices=SCALE_MODES, default=SCALE_MODE,
+                        help="upscale a base render (nearest) or rasterize natively (vector)")
+    parser.add_argument("--compress-level", type=int, choices=range(10), default=PNG_COMPRESS_LEVEL,
+                        metavar="0-9", help="zlib level for PNGs (1 fastest, 9 smallest)")
+    parser.add_argument("--quantize", action="store_true",
+                        help="write palette PNGs (lossless up to 256 colours, octree-quantized beyond)")
+    parser.add_argument("--write-threads", type=int, default=PNG_WRITE_THREADS,
+                        help="threads encoding and writing PNGs")
+    parser.add_argument("--indexed", action="store_true",
+                        help="render character frames as palette indices and write palette PNGs")
+    parser.add_argument("--animations", nargs="+", choices=ANIMATION_FORMATS, default=(),
+                        help="also export each animation cycle as an animated file in these formats")
+    parser.add_argument("--no-trim", dest="trim", action="store_false",
+                        help="pack whole frames into the atlas instead of cropping them to their visible pixels")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="write identical frames once and alias the rest in frame_aliases.json")
+    parser.add_argument("--dedupe-tolerance", type=int, nargs="?", const=DEDUPE_TOLERANCE,
+                        help="also alias frames that differ only by noise jitter up to this channel difference")
+    parser.add_argument("--cast", metavar="JSON",
+                        help="also render the variant specs listed in this file (see comedian_cast.json)")
+    parser.add_argument("--palettes", nargs="+", choices=PALETTES, default=(),
+                        help="with --indexed, also write every character frame recoloured into these palettes")
+    parser.add_argument("--fps", type=positive_float,
+                        help="resample every animation cycle to this frame rate (default: its keyframes' own rate)")
+    args = parser.parse_args()
+    if args.palettes and not args.indexed:
+        parser.error("--palettes recolours index frames, so it needs --indexed")
+    cast = None
+    if args.cast:
+        with open(args.cast) as f:
+            cast = json.load(f)
+    sink = DiskSink(compress_level=args.compress_level, quantize=args.quantize, threads=args.write_threads)
+    generate_all_assets(args.jobs or os.cpu_count(), args.force, args.scale, args.scale_mode, sink,
+                        indexed=args.indexed, animations=args.animations, trim=args.trim,
+                        dedupe=args.dedupe, dedupe_tolerance=args.dedupe_tolerance, fps=args.fps,
+                        cast=cast, palettes=args.palettes)
\ No newline at end of file
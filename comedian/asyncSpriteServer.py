@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import collections
+import http
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import spriteServer as sprites
+
+# Seconds a rendered asset stays fresh; after that it is still served, but
+# the first request to see it stale starts a background re-render
+MAX_AGE = 3600
+MAX_HEADER_BYTES = 16 * 1024
+
+# =========================
+# COALESCING RENDER CACHE
+# =========================
+
+def render_pool(workers=None):
+    """Return the process pool renders are offloaded to.
+
+    Workers are spawned rather than forked: the pool starts them from the
+    event loop's thread, and forking a threaded process can leave a worker
+    holding a lock that no thread will ever release.
+    """
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+class AssetCache:
+    """Render assets in a process pool with request coalescing and stale-while-revalidate.
+
+    Every key has at most one render in flight; concurrent requests for it
+    all await that render. Cached entries older than max_age are returned
+    immediately while a background render replaces them. Rendering, PNG
+    encoding and ETag hashing all happen in the worker processes, so the
+    event loop only moves finished bytes around.
+    """
+
+    def __init__(self, executor, cache_bytes=sprites.CACHE_BYTES, max_age=MAX_AGE):
+        self.executor = executor
+        self.cache = sprites.FrameCache(cache_bytes)
+        self.max_age = max_age
+        self.inflight = {}
+        self.stats = collections.Counter()
+
+    async def get(self, key):
+        """Return (png bytes, etag, status), status being HIT, STALE, MISS or COALESCED."""
+        entry = self.cache.get(key)
+        if entry is not None:
+            body, etag, fresh_until = entry
+            if time.monotonic() < fresh_until:
+                self.stats["hit"] += 1
+                return body, etag, "HIT"
+            if key not in self.inflight:
+                self.start_render(key)
+            self.stats["stale"] += 1
+            return body, etag, "STALE"
+
+        if key in self.inflight:
+            status = "COALESCED"
+        else:
+            self.start_render(key)
+            status = "MISS"
+        self.stats[status.lower()] += 1
+        # Shielded so a client hanging up doesn't cancel a render others are waiting on
+        body, etag = await asyncio.shield(self.inflight[key])
+        return body, etag, status
+
+    def start_render(self, key):
+        future = asyncio.get_running_loop().run_in_executor(self.executor, sprites.render_png, key)
+        self.inflight[key] = future
+        self.stats["render"] += 1
+        future.add_done_callback(lambda done: self.finish_render(key, done))
+
+    def finish_render(self, key, future):
+        del self.inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            # Waiting requests see the error; a failed background refresh keeps the stale entry
+            self.stats["render_error"] += 1
+            return
+        body, etag = future.result()
+        self.cache.put(key, (body, etag, time.monotonic() + self.max_age))
+
+    def invalidate(self):
+        """Mark every cached asset stale, so each is re-rendered on its next request."""
+        with self.cache.lock:
+            for key, (body, etag, _) in self.cache.entries.items():
+                self.cache.entries[key] = (body, etag, 0)
+
+# =========================
+# HTTP FRONT END
+# =========================
+
+def response_bytes(status, headers, body=b""):
+    """Serialise an HTTP/1.1 response, so it goes out in a single write."""
+    lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+def text_response(status, message):
+    body = (message + "\n").encode()
+    return status, {"Content-Type": "text/plain; charset=utf-8", "Content-Length": len(body)}, body
+
+class AsyncSpriteServer:
+    """Minimal keep-alive HTTP/1.1 server answering GET and HEAD for sprite assets."""
+
+    def __init__(self, assets, verbose=True):
+        self.assets = assets
+        self.verbose = verbose
+        self.server = None
+        self.connections = set()
+
+    async def respond(self, method, target, headers):
+        """Return (status, headers, body) for one request."""
+        if method not in ("GET", "HEAD"):
+            return text_response(405, "only GET and HEAD are supported")
+        try:
+            key = sprites.parse_asset_key(target)
+        except ValueError as error:
+            return text_response(400, str(error))
+        except LookupError:
+            return text_response(404, "no such asset")
+        try:
+            body, etag, cache_status = await self.assets.get(key)
+        except Exception as error:
+            return text_response(500, f"render failed: {error}")
+
+        response_headers = {"ETag": etag, "Cache-Control": sprites.CACHE_CONTROL, "X-Cache": cache_status}
+        if sprites.etag_matches(headers.get("if-none-match"), etag):
+            return 304, response_headers, b""
+        response_headers.update({"Content-Type": "image/png", "Content-Length": len(body)})
+        return 200, response_headers, body
+
+    async def handle_connection(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    writer.write(response_bytes(*text_response(400, "malformed request line")))
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                status, response_headers, body = await self.respond(method, target, headers)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if not keep_alive:
+                    response_headers["Connection"] = "close"
+                writer.write(response_bytes(status, response_headers, b"" if method == "HEAD" else body))
+                await writer.drain()
+                if self.verbose:
+                    print(f"{method} {urlsplit(target).path} {status} {response_headers.get('X-Cache', '')}")
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8000):
+        """Start listening (port 0 picks a free port) and return the asyncio server."""
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        return self.server
+
+    async def stop(self):
+        """Stop listening and close idle keep-alive connections, letting their handlers finish."""
+        self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        await self.server.wait_closed()
+        while self.connections:
+            await asyncio.sleep(0)
+
+async def serve(host="127.0.0.1", port=8000, workers=None, cache_bytes=sprites.CACHE_BYTES, max_age=MAX_AGE):
+    """Run the asyncio sprite server until cancelled."""
+    with render_pool(workers) as executor:
+        server = await AsyncSpriteServer(AssetCache(executor, cache_bytes, max_age)).start(host, port)
+        print(f"Serving sprites on http://{host}:{server.sockets[0].getsockname()[1]}/ "
+              f"(e.g. /sprites/talking/1.png?palette=tuxedo&scale=2)")
+        async with server:
+            await server.serve_forever()
+
+# =========================
+# LOAD AND HERD TESTS
+# =========================
+
+async def thundering_herd(assets, host, port, path, clients=32):
+    """Fire concurrent requests for one uncached asset and report how many renders they caused."""
+    async def fetch():
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        await reader.read()
+        writer.close()
+        return status
+
+    renders = assets.stats["render"]
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(fetch() for _ in range(clients)))
+    print(f"herd: {clients} concurrent requests for {path} -> {assets.stats['render'] - renders} render(s), "
+          f"statuses {dict(collections.Counter(statuses))}, {time.perf_counter() - start:.2f}s")
+
+def load_test(requests=2000, concurrency=8, workers=None, cache_bytes=sprites.CACHE_BYTES):
+    """Run the herd test and the shared throughput test against an in-process asyncio server."""
+    loop = asyncio.new_event_loop()
+    executor = render_pool(workers)
+    assets = AssetCache(executor, cache_bytes)
+    front = AsyncSpriteServer(assets, verbose=False)
+    server = loop.run_until_complete(front.start(port=0))
+    host, port = server.sockets[0].getsockname()[:2]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(
+            thundering_herd(assets, host, port, "/curtain/full.png?scale=4&mode=vector"), loop).result()
+        sprites.measure_throughput(host, port, requests=requests, concurrency=concurrency)
+
+        # Serve stale entries while they re-render in the background
+        loop.call_soon_threadsafe(assets.invalidate)
+        statuses = collections.Counter(status for status, _ in sprites._fetch_many(host, port, sprites.default_paths()))
+        print(f"after invalidate: statuses {dict(statuses)}, cache {dict(assets.stats)}")
+    finally:
+        asyncio.run_coroutine_threadsafe(front.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        executor.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve comedian sprites from an asyncio server with a render pool.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="render processes (default: every CPU)")
+    parser.add_argument("--cache-mb", type=float, default=sprites.CACHE_BYTES / 2**20,
+                        help="memory for cached PNGs in MiB")
+    parser.add_argument("--max-age", type=float, default=MAX_AGE,
+                        help="seconds before a cached asset is re-rendered in the background")
+    parser.add_argument("--load-test", action="store_true",
+                        help="run the herd and throughput tests against an in-process server and exit")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per load test phase")
+    parser.add_argument("--concurrency", type=int, default=8, help="load test client threads")
+    args = parser.parse_args()
+
+    cache_bytes = int(args.cache_mb * 2**20)
+    if args.load_test:
+        load_test(args.requests, args.concurrency, args.workers, cache_bytes)
+    else:
+        try:
+            asyncio.run(serve(args.host, args.port, args.workers, cache_bytes, args.max_age))
+        except KeyboardInterrupt:
+            pass
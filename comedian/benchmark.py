@@ -0,0 +1,452 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+import artCreator as art
+
+# Canvas sizes to benchmark; sizes above CHAR_SIZE render at an integer scale
+SIZES = (96, 192, 384)
+
+# =========================
+# MEASUREMENT
+# =========================
+
+def measure(func, repeat=20, warmup=1):
+    """Time func() and return its timing statistics and peak traced memory.
+
+    Timing runs and the memory run are separate, because tracemalloc slows
+    down every allocation while it is tracing.
+    """
+    for _ in range(warmup):
+        func()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    times = np.array(times)
+    return {
+        "repeat": repeat,
+        "mean_s": float(times.mean()),
+        "stdev_s": float(times.std()),
+        "min_s": float(times.min()),
+        "p50_s": float(np.percentile(times, 50)),
+        "p90_s": float(np.percentile(times, 90)),
+        "p99_s": float(np.percentile(times, 99)),
+        "max_s": float(times.max()),
+        "peak_bytes": int(peak),
+    }
+
+# =========================
+# BENCHMARK CASES
+# =========================
+
+# Each case maker takes a canvas size and returns a zero-argument callable that
+# does one unit of work at that size.
+
+def _opaque_canvas(size):
+    canvas = art.create_blank_canvas(size, size)
+    canvas[...] = art.colors["blue"]
+    return canvas
+
+def case_draw_pixel(size):
+    canvas = art.create_blank_canvas(size, size)
+    points = [(i % size, (i * 7) % size) for i in range(1000)]
+    def run():
+        for x, y in points:
+            art.draw_pixel(canvas, x, y, art.colors["red"])
+    return run
+
+def case_draw_rectangle(size):
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_rectangle(canvas, size // 8, size // 8, 3 * size // 4, 3 * size // 4, art.colors["red"])
+
+def case_draw_circle(size):
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_circle(canvas, size // 2, size // 2, size // 3, art.colors["red"])
+
+def case_draw_line(size):
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_line(canvas, 0, 0, size - 1, size // 2, art.colors["red"])
+
+def case_draw_polygon(size):
+    canvas = art.create_blank_canvas(size, size)
+    # A five-pointed star: concave, with crossing spans on most rows
+    star = [(size / 2 + (0.45 if i % 2 == 0 else 0.2) * size * math.sin(i * math.pi / 5),
+             size / 2 - (0.45 if i % 2 == 0 else 0.2) * size * math.cos(i * math.pi / 5)) for i in range(10)]
+    return lambda: art.draw_polygon(canvas, star, art.colors["red"])
+
+def case_draw_thick_line(size):
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_thick_line(canvas, size // 8, size // 8, 7 * size // 8, size // 2, size / 24,
+                                       art.colors["red"])
+
+def case_draw_thick_line_aa(size):
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_thick_line(canvas, size // 8, size // 8, 7 * size // 8, size // 2, size / 24,
+                                       art.colors["red"], antialias=True)
+
+def case_draw_limb(size):
+    scale = max(1, size // art.CHAR_SIZE)
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_limb(canvas, 25, 35, -29 * math.sin(math.pi / 4), 29 * math.cos(math.pi / 4),
+                                 8, 4, art.colors["blue"], scale=scale)
+
+def case_optimize_display_list(size):
+    rig = art.load_rig()
+    display = art.pose_display_list(rig, art.compile_animation(rig, "talking")[0])
+    return lambda: art.optimize(display.commands, art.CHAR_SIZE, art.CHAR_SIZE)
+
+def case_execute_display_list(size):
+    scale = max(1, size // art.CHAR_SIZE)
+    rig = art.load_rig()
+    display = art.pose_display_list(rig, art.compile_animation(rig, "talking")[0])
+    commands = art.optimize(display.commands, art.CHAR_SIZE, art.CHAR_SIZE)
+    return lambda: art.execute(commands, art.create_blank_canvas(size, size), scale)
+
+def case_compile_animation(size):
+    rig = art.load_rig()
+    return lambda: art.compile_animation(rig, "laughing", 60)
+
+def case_recolor_frames(size):
+    scale = max(1, size // art.CHAR_SIZE)
+    frames = art.render_frames(art.indexed_jobs(art.talking_frame_jobs(scale=scale, mode="vector")))
+    return lambda: art.recolor_frames(frames, "tuxedo")
+
+def case_add_noise(size):
+    canvas = _opaque_canvas(size)
+    rng = np.random.default_rng(art.NOISE_SEED)
+    return lambda: art.add_noise(canvas, 0, 0, size, size, 0.02, rng)
+
+def case_draw_face(size):
+    scale = max(1, size // art.CHAR_SIZE)
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_face(canvas, 36, 24, "talking", "front", scale=scale)
+
+def case_draw_hair(size):
+    scale = max(1, size // art.CHAR_SIZE)
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_hair(canvas, 36, 24, "comedian", "front", scale=scale)
+
+def case_draw_bow_tie(size):
+    scale = max(1, size // art.CHAR_SIZE)
+    canvas = art.create_blank_canvas(size, size)
+    return lambda: art.draw_bow_tie(canvas, 48, 49, 12, scale=scale)
+
+def _generator_case(create, **kwargs):
+    def make(size):
+        scale = max(1, size // art.CHAR_SIZE)
+        return lambda: create(scale=scale, mode="vector", **kwargs)
+    return make
+
+def case_generate_all_assets(size):
+    scale = max(1, size // art.CHAR_SIZE)
+    return lambda: art.generate_all_assets(force=True, scale=scale, mode="vector")
+
+CASES = {
+    "draw_pixel": case_draw_pixel,
+    "draw_rectangle": case_draw_rectangle,
+    "draw_circle": case_draw_circle,
+    "draw_line": case_draw_line,
+    "draw_polygon": case_draw_polygon,
+    "draw_thick_line": case_draw_thick_line,
+    "draw_thick_line_aa": case_draw_thick_line_aa,
+    "draw_limb": case_draw_limb,
+    "optimize_display_list": case_optimize_display_list,
+    "execute_display_list": case_execute_display_list,
+    "compile_animation": case_compile_animation,
+    "recolor_frames": case_recolor_frames,
+    "add_noise": case_add_noise,
+    "draw_face": case_draw_face,
+    "draw_hair": case_draw_hair,
+    "draw_bow_tie": case_draw_bow_tie,
+    "create_pacing_frames": _generator_case(art.create_pacing_frames),
+    "create_talking_frames": _generator_case(art.create_talking_frames),
+    "create_laughing_frames": _generator_case(art.create_laughing_frames),
+    "create_curtain": _generator_case(art.create_curtain),
+    "generate_all_assets": case_generate_all_assets,
+}
+
+# Whole-asset runs are slow, so they get fewer repetitions
+SLOW_CASES = {"create_curtain", "generate_all_assets"}
+
+# =========================
+# SUITE AND REPORTING
+# =========================
+
+def environment():
+    """Describe the machine and commit the results were measured on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def run_suite(sizes=SIZES, repeat=20, only=None):
+    """Run every benchmark case at every size and return the results.
+
+    The create_* cases render in memory; the full generate_all_assets run
+    writes to a temporary directory and its progress output is discarded.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        saved_output_dir, art.output_dir = art.output_dir, tmp
+        try:
+            for name, make_case in CASES.items():
+                if only and not any(pattern in name for pattern in only):
+                    continue
+                for size in sizes:
+                    runs = max(3, repeat // 4) if name in SLOW_CASES else repeat
+                    stats = measure(make_case(size), repeat=runs)
+                    results.append({"name": name, "size": size, **stats})
+        finally:
+            art.output_dir = saved_output_dir
+    return {"environment": environment(), "results": results}
+
+def print_report(report, baseline=None):
+    """Print a results table, with the change against a baseline report if one is given."""
+    previous = {}
+    if baseline:
+        previous = {(r["name"], r["size"]): r for r in baseline["results"]}
+
+    print(f"{'benchmark':<24} {'size':>5} {'mean ms':>10} {'p50 ms':>10} {'p90 ms':>10} "
+          f"{'p99 ms':>10} {'peak KiB':>10}" + (f" {'vs base':>8}" if baseline else ""))
+    for r in report["results"]:
+        line = (f"{r['name']:<24} {r['size']:>5} {r['mean_s'] * 1e3:>10.3f} {r['p50_s'] * 1e3:>10.3f} "
+                f"{r['p90_s'] * 1e3:>10.3f} {r['p99_s'] * 1e3:>10.3f} {r['peak_bytes'] / 1024:>10.1f}")
+        old = previous.get((r["name"], r["size"]))
+        if old:
+            line += f" {r['p50_s'] / old['p50_s']:>7.2f}x"
+        print(line)
+
+# =========================
+# SCALE COMPARISON
+# =========================
+
+def render_all(scale, mode):
+    """Render every character frame and curtain image without saving them."""
+    jobs = (art.pacing_frame_jobs(art.CHAR_SIZE, 4, scale=scale, mode=mode)
+            + art.talking_frame_jobs(art.CHAR_SIZE, 3, scale=scale, mode=mode)
+            + art.laughing_frame_jobs(art.CHAR_SIZE, 3, scale=scale, mode=mode)
+            + art.curtain_jobs(scale=scale, mode=mode))
+    return art.render_jobs(jobs)
+
+def time_cold(func, *args, repeat=3):
+    """Return the best wall time of func(*args) with the tile and display-list caches emptied before each run."""
+    best = float("inf")
+    for _ in range(repeat):
+        art.part_tile.cache_clear()
+        art.face_tile.cache_clear()
+        art.display_list_canvas.cache_clear()
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_scales(scales=(1, 2, 4), repeat=3):
+    """Time a full render at each scale in both scale modes and print a table."""
+    print(f"{'mode':<8} {'scale':>5} {'frame px':>9} {'seconds':>9} {'vs 1x':>7}")
+    for mode in art.SCALE_MODES:
+        baseline = None
+        for scale in scales:
+            seconds = time_cold(render_all, scale, mode, repeat=repeat)
+            baseline = baseline or seconds
+            size = art.CHAR_SIZE * scale
+            print(f"{mode:<8} {scale:>5} {f'{size}x{size}':>9} {seconds:>9.4f} {seconds / baseline:>6.1f}x")
+
+# =========================
+# PNG ENCODING
+# =========================
+
+def benchmark_png(levels=(1, 6, 9), threads=(1, 4), repeat=3):
+    """Compare PNG size and encode time across compression levels, quantization and thread counts."""
+    frames = render_all(1, "nearest")
+    frames = [(f"frame_{i}.png", canvas) for i, canvas in enumerate(frames)]
+    print(f"{'level':>5} {'quantize':>8} {'threads':>7} {'bytes':>10} {'encode ms':>10} {'wall ms':>8}")
+    for quantize in (False, True):
+        for level in levels:
+            for thread_count in threads:
+                best_wall, report = float("inf"), None
+                for _ in range(repeat):
+                    png = art.ArchiveSink(io.BytesIO(), compress_level=level, quantize=quantize,
+                                          threads=thread_count)
+                    start = time.perf_counter()
+                    png.write_images(frames)
+                    wall = time.perf_counter() - start
+                    png.close()
+                    if wall < best_wall:
+                        best_wall, report = wall, png.report_totals()
+                print(f"{level:>5} {str(quantize):>8} {thread_count:>7} {report['bytes']:>10,} "
+                      f"{report['encode_ms']:>10.1f} {best_wall * 1e3:>8.1f}")
+
+# =========================
+# STREAMING MEMORY
+# =========================
+
+def peak_memory(func, *args):
+    """Return the peak traced memory, in bytes, of one call of func(*args)."""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark_streaming(frame_counts=(8, 64, 256), scale=4):
+    """Compare peak memory of writing a talking animation from a list and from a generator."""
+    def from_list(count, directory):
+        jobs = art.talking_frame_jobs(art.CHAR_SIZE, count, scale=scale, mode="vector")
+        art.write_frames(art.DiskSink(directory, verbose=False), art.render_frames(jobs))
+
+    def streamed(count, directory):
+        frames = art.iter_talking_frames(num_frames=count, scale=scale, mode="vector")
+        art.write_frames(art.DiskSink(directory, verbose=False), frames)
+
+    size = art.CHAR_SIZE * scale
+    print(f"{'frames':>6} {'list peak KiB':>14} {'stream peak KiB':>16}  ({size}x{size} frames)")
+    for count in frame_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            listed = peak_memory(from_list, count, tmp)
+            stream = peak_memory(streamed, count, tmp)
+        print(f"{count:>6} {listed / 1024:>14,.0f} {stream / 1024:>16,.0f}")
+
+# =========================
+# ANIMATED EXPORT
+# =========================
+
+def decode_ms(blobs, repeat=3):
+    """Best time, in milliseconds, to decode every frame of every encoded image in blobs."""
+    def decode():
+        for blob in blobs:
+            for frame in ImageSequence.Iterator(Image.open(io.BytesIO(blob))):
+                frame.convert("RGBA")
+    return time_cold(decode, repeat=repeat) * 1e3
+
+def benchmark_animations(formats=tuple(art.ANIMATION_FORMATS), repeat=3):
+    """Compare separate frame PNGs against one animated file per cycle, in bytes and decode time."""
+    print(f"{'canvas':>7} {'format':>7} {'files':>5} {'bytes':>9} {'decode ms':>9}")
+    for indexed in (False, True):
+        frames = list(art.iter_pacing_frames(indexed=indexed)) + list(art.iter_talking_frames(indexed=indexed)) \
+            + list(art.iter_laughing_frames(indexed=indexed))
+        rows = {"png": [art.encode_png(canvas) for _, canvas in frames]}
+        for fmt in formats:
+            rows[fmt] = [art.encode_animation(canvases, fmt)
+                         for canvases in art.group_animations(frames).values()]
+        for fmt, blobs in rows.items():
+            print(f"{'indexed' if indexed else 'rgba':>7} {fmt:>7} {len(blobs):>5} "
+                  f"{sum(map(len, blobs)):>9,} {decode_ms(blobs, repeat):>9.2f}")
+
+# =========================
+# DIRTY RECTANGLES
+# =========================
+
+def benchmark_deltas():
+    """Compare per-frame bytes of full frames with only their dirty rectangles, raw and as PNG."""
+    print(f"{'canvas':>7} {'animation':>22} {'raw full':>9} {'raw dirty':>9} {'png full':>9} {'png dirty':>9}")
+    for indexed in (False, True):
+        frames = list(art.iter_pacing_frames(indexed=indexed)) + list(art.iter_talking_frames(indexed=indexed)) \
+            + list(art.iter_laughing_frames(indexed=indexed))
+        deltas = art.create_frame_deltas(frames)
+        for name, canvases in art.group_animations(frames).items():
+            animation = deltas["animations"][name]
+            png_full = sum(len(art.encode_png(canvas)) for canvas in canvases)
+            png_dirty = sum(len(art.encode_png(canvas[y:y + h, x:x + w]))
+                            for canvas, entry in zip(canvases, animation["frames"])
+                            for x, y, w, h in entry["rects"])
+            print(f"{'indexed' if indexed else 'rgba':>7} {name:>22} {animation['frame_bytes']:>9,} "
+                  f"{animation['mean_dirty_bytes']:>9,} {png_full // len(canvases):>9,} "
+                  f"{png_dirty // len(canvases):>9,}")
+
+def benchmark_cast(counts=(100, 1000)):
+    """Time whole casts of random variants, written as palette PNGs to disk and as RGBA to memory."""
+    rng = np.random.default_rng(art.NOISE_SEED)
+    print(f"{'variants':>8} {'sink':>7} {'seconds':>8} {'per minute':>11}")
+    for count in counts:
+        cast = [{"name": f"v{i}", "hair": art.HAIR_STYLES[i % len(art.HAIR_STYLES)],
+                 "suit": rng.integers(0, 256, 3).tolist(),
+                 "colors": {"brown": rng.integers(0, 256, 3).tolist() + [255]}} for i in range(count)]
+        with tempfile.TemporaryDirectory() as directory:
+            for label, sink in (("disk", art.DiskSink(directory, verbose=False)), ("memory", art.MemorySink())):
+                start = time.perf_counter()
+                art.write_cast(sink, art.create_cast(cast))
+                seconds = time.perf_counter() - start
+                print(f"{count:>8} {label:>7} {seconds:>8.2f} {count / seconds * 60:>11,.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark comedian asset generation.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES),
+                        help="canvas sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="timed runs per benchmark (whole-asset cases use fewer)")
+    parser.add_argument("--only", nargs="+",
+                        help="run only benchmarks whose name contains one of these strings")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--scale-table", action="store_true",
+                        help="instead of the suite, compare full-render cost across --scales")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4],
+                        help="output scales for --scale-table")
+    parser.add_argument("--stream-table", action="store_true",
+                        help="instead of the suite, compare peak memory of list and streaming frame writes")
+    parser.add_argument("--png-table", action="store_true",
+                        help="instead of the suite, compare PNG compression levels, quantization and threads")
+    parser.add_argument("--anim-table", action="store_true",
+                        help="instead of the suite, compare frame PNGs with animated APNG/WebP/GIF files")
+    parser.add_argument("--delta-table", action="store_true",
+                        help="instead of the suite, compare full frames with their dirty rectangles in bytes")
+    parser.add_argument("--cast-table", action="store_true",
+                        help="instead of the suite, time batch renders of random variant casts")
+    args = parser.parse_args()
+
+    if args.scale_table:
+        benchmark_scales(args.scales, max(1, args.repeat // 4))
+    elif args.stream_table:
+        benchmark_streaming()
+    elif args.png_table:
+        benchmark_png(repeat=max(1, args.repeat // 4))
+    elif args.delta_table:
+        benchmark_deltas()
+    elif args.cast_table:
+        benchmark_cast()
+    elif args.anim_table:
+        benchmark_animations(repeat=max(1, args.repeat // 4))
+    else:
+        report = run_suite(args.sizes, args.repeat, args.only)
+        baseline = None
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        print_report(report, baseline)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {args.output}")
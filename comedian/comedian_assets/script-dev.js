@@ -79,6 +79,9 @@ class ComedianStage {
     }
     
     async init() {
+        // Point the sprite elements at the atlas before anything is shown
+        await this.loadSpriteAtlas();
+        
         // Load jokes from JSON file
         try {
             const response = await fetch('comedian_assets/dadJokes.json');
@@ -99,6 +102,46 @@ class ComedianStage {
         setTimeout(() => this.startShow(), 1000);
     }
     
+    async loadSpriteAtlas() {
+        // Every element with a data-frame attribute shows one rectangle of the shared atlas
+        const sprites = document.querySelectorAll('[data-frame]');
+        
+        try {
+            const response = await fetch('comedian_assets/comedian_atlas.json');
+            const atlas = await response.json();
+            const image = `url('comedian_assets/${atlas.image}')`;
+            
+            sprites.forEach(sprite => {
+                const frame = atlas.frames[sprite.dataset.frame];
+                if (!frame) return;
+
+                // Trimmed frames cover only their crop of the full frame, so shrink the element to match
+                if (frame.offset) {
+                    sprite.style.left = `${frame.offset.x / frame.source.w * 100}%`;
+                    sprite.style.top = `${frame.offset.y / frame.source.h * 100}%`;
+                    sprite.style.width = `${frame.w / frame.source.w * 100}%`;
+                    sprite.style.height = `${frame.h / frame.source.h * 100}%`;
+                }
+
+                // Percentages keep the frame fitted to the element at any display size
+                const spareWidth = atlas.size.w - frame.w;
+                const spareHeight = atlas.size.h - frame.h;
+                sprite.style.backgroundImage = image;
+                sprite.style.backgroundSize = `${atlas.size.w / frame.w * 100}% ${atlas.size.h / frame.h * 100}%`;
+                sprite.style.backgroundPosition =
+                    `${spareWidth ? frame.x / spareWidth * 100 : 0}% ${spareHeight ? frame.y / spareHeight * 100 : 0}%`;
+            });
+            console.log('Sprite atlas loaded:', Object.keys(atlas.frames).length, 'frames');
+        } catch (error) {
+            console.error('Error loading sprite atlas:', error);
+            // Fall back to the individual frame images
+            sprites.forEach(sprite => {
+                sprite.style.backgroundImage = `url('comedian_assets/${sprite.dataset.frame}.png')`;
+                sprite.style.backgroundSize = '100% 100%';
+            });
+        }
+    }
+    
     startShow() {
         // 1. Open the curtain
         this.curtainLeft.classList.add('curtain-open');
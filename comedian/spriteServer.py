@@ -0,0 +1,328 @@
+import argparse
+import collections
+import functools
+import hashlib
+import http.client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import artCreator as art
+
+# Encoded PNGs kept in memory, by total size rather than entry count
+CACHE_BYTES = 64 * 1024 * 1024
+MAX_SCALE = 8
+MAX_SEED = 2**32 - 1  # Every distinct seed is its own cache entry, so keep them to 32 bits
+CACHE_CONTROL = "public, max-age=3600"
+
+CURTAIN_SIDES = ("left", "right", "full")
+EXPRESSIONS = ("neutral", "talking", "laughing", "thinking")
+FACINGS = ("front", "left", "right")
+
+# The palette is swapped in module-level colors, so renders take turns
+render_lock = threading.Lock()
+
+# =========================
+# ASSET KEYS AND RENDERING
+# =========================
+
+@functools.cache
+def animations():
+    """Return name -> job builder for every rig animation, at the frame counts generate_all_assets bakes.
+
+    The rig is read on first use rather than at import.
+    """
+    rig = art.load_rig()
+    return {name: functools.partial(art.rig_frame_jobs, name, None, art.CHAR_SIZE, rig=rig)
+            for name in rig["animations"]}
+
+# An asset key is a (kind, name, part, palette, scale, mode, seed) tuple:
+#   /sprites/<animation>/<frame>.png   kind "sprite", frame numbered from 1
+#   /curtain/<side>.png                kind "curtain", side left/right/full
+#   /faces/<expression>/<facing>.png   kind "face"
+# with ?palette=, ?scale=, ?mode= and ?seed= query parameters.
+
+def parse_asset_key(url):
+    """Turn a request URL into an asset key.
+
+    Raises LookupError for paths that name no asset and ValueError for bad
+    query parameters.
+    """
+    parts = urlsplit(url)
+    path = parts.path.strip("/").split("/")
+    query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+
+    palette = query.get("palette", "classic")
+    if palette not in art.PALETTES:
+        raise ValueError(f"unknown palette {palette!r}")
+    scale = int(query.get("scale", art.SCALE))
+    if not 1 <= scale <= MAX_SCALE:
+        raise ValueError(f"scale must be between 1 and {MAX_SCALE}")
+    mode = query.get("mode", art.SCALE_MODE)
+    if mode not in art.SCALE_MODES:
+        raise ValueError(f"unknown scale mode {mode!r}")
+    seed = int(query.get("seed", art.NOISE_SEED))
+    if not 0 <= seed <= MAX_SEED:
+        raise ValueError(f"seed must be between 0 and {MAX_SEED}")
+
+    if not path[-1].endswith(".png"):
+        raise LookupError(parts.path)
+    path[-1] = path[-1][:-len(".png")]
+    if len(path) == 3 and path[0] == "sprites" and path[1] in animations() and path[2].isdigit():
+        kind, name, part = "sprite", path[1], int(path[2])
+        if not 1 <= part <= len(animations()[name](seed, scale, mode)):
+            raise LookupError(parts.path)
+    elif len(path) == 2 and path[0] == "curtain" and path[1] in CURTAIN_SIDES:
+        kind, name, part = "curtain", path[1], 0
+    elif len(path) == 3 and path[0] == "faces" and path[1] in EXPRESSIONS and path[2] in FACINGS:
+        kind, name, part = "face", path[1], path[2]
+    else:
+        raise LookupError(parts.path)
+    return (kind, name, part, palette, scale, mode, seed)
+
+def render_asset(key):
+    """Render the canvas for an asset key."""
+    kind, name, part, palette, scale, mode, seed = key
+    with render_lock, art.use_palette(palette):
+        if kind == "sprite":
+            _, renderer, args = animations()[name](seed, scale, mode)[part - 1]
+            return renderer(*args)
+        if kind == "curtain":
+            return art.render_curtain_side(name, scale=scale, mode=mode)
+        face_size = (24, 26)
+        if mode == "nearest" and scale > 1:
+            return art.upscale_nearest(art.face_tile(name, part, face_size, 1, art.palette_key()), scale)
+        return art.face_tile(name, part, face_size, scale, art.palette_key()).copy()
+
+def make_etag(body):
+    """Return a strong ETag for an encoded asset."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def render_png(key):
+    """Render and encode an asset, returning (png bytes, etag); safe to run in a worker process."""
+    body = art.encode_png(render_asset(key))
+    return body, make_etag(body)
+
+# =========================
+# ENCODED FRAME CACHE
+# =========================
+
+class FrameCache:
+    """Thread-safe LRU of key -> (png bytes, etag, ...), bounded by the total bytes held.
+
+    Entries are tuples starting with the PNG bytes; anything after them
+    (such as the asyncio cache's freshness deadline) is stored untouched.
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key)[0])
+            if len(entry[0]) > self.max_bytes:
+                return
+            self.entries[key] = entry
+            self.size += len(entry[0])
+            # Evict least recently used entries until the new one fits
+            while self.size > self.max_bytes:
+                self.size -= len(self.entries.popitem(last=False)[1][0])
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.size,
+                    "hits": self.hits, "misses": self.misses}
+
+def get_asset(cache, key):
+    """Return (png bytes, etag, cache hit) for an asset key, rendering it on a miss."""
+    entry = cache.get(key)
+    if entry is not None:
+        return entry + (True,)
+    entry = render_png(key)
+    cache.put(key, entry)
+    return entry + (False,)
+
+def etag_matches(header, etag):
+    """Check an If-None-Match header against an ETag, using weak comparison."""
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+# =========================
+# HTTP SERVER
+# =========================
+
+class SpriteHandler(BaseHTTPRequestHandler):
+    """Serve rendered assets, answering conditional requests with 304 Not Modified."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, since every response has a Content-Length
+    disable_nagle_algorithm = True  # Headers and body are separate writes; don't stall on delayed ACKs
+
+    def do_GET(self):
+        self.send_asset(head=False)
+
+    def do_HEAD(self):
+        self.send_asset(head=True)
+
+    def send_asset(self, head):
+        try:
+            key = parse_asset_key(self.path)
+        except ValueError as error:
+            return self.send_text(400, str(error), head)
+        except LookupError:
+            return self.send_text(404, "no such asset", head)
+
+        try:
+            body, etag, hit = get_asset(self.server.cache, key)
+        except Exception as error:
+            return self.send_text(500, f"render failed: {error}", head)
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", CACHE_CONTROL)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", CACHE_CONTROL)
+        self.send_header("X-Cache", "HIT" if hit else "MISS")
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def send_text(self, status, message, head=False):
+        body = (message + "\n").encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def make_server(host="127.0.0.1", port=8000, cache_bytes=CACHE_BYTES, verbose=True):
+    """Create a threaded sprite server with its own frame cache (port 0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), SpriteHandler)
+    server.daemon_threads = True
+    server.cache = FrameCache(cache_bytes)
+    server.verbose = verbose
+    return server
+
+# =========================
+# LOAD TEST
+# =========================
+
+def _fetch_many(host, port, paths, etags=None):
+    """Fetch paths in order over one keep-alive connection.
+
+    Returns (status, etag) for each request. With an etags dict every
+    request is conditional on the path's ETag.
+    """
+    connection = http.client.HTTPConnection(host, port)
+    results = []
+    try:
+        for path in paths:
+            headers = {"If-None-Match": etags[path]} if etags else {}
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            results.append((response.status, response.getheader("ETag")))
+    finally:
+        connection.close()
+    return results
+
+def default_paths():
+    """List one URL for every sprite frame and face in every palette at base scale."""
+    paths = []
+    for palette in art.PALETTES:
+        for name, jobs in animations().items():
+            count = len(jobs(art.NOISE_SEED, 1, art.SCALE_MODE))
+            paths += [f"/sprites/{name}/{frame}.png?palette={palette}" for frame in range(1, count + 1)]
+        paths += [f"/faces/{expression}/{facing}.png?palette={palette}"
+                  for expression in EXPRESSIONS for facing in FACINGS]
+    return paths
+
+def measure_throughput(host, port, paths=None, requests=2000, concurrency=8):
+    """Load-test a running sprite server and print requests/sec.
+
+    Every path is requested once to fill the cache, then each client thread
+    cycles through the paths on its own keep-alive connection, first with
+    plain GETs and then with conditional GETs that should all be 304s.
+    """
+    paths = paths or default_paths()
+    start = time.perf_counter()
+    etags = {path: etag for path, (_, etag) in zip(paths, _fetch_many(host, port, paths))}
+    print(f"cold: rendered {len(paths)} assets in {time.perf_counter() - start:.2f}s")
+
+    per_client = max(1, requests // concurrency)
+    plans = [[paths[(client + i) % len(paths)] for i in range(per_client)] for client in range(concurrency)]
+    for label, conditional_etags in (("warm GET", None), ("conditional GET", etags)):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = pool.map(lambda plan: _fetch_many(host, port, plan, conditional_etags), plans)
+            statuses = [status for result in results for status, _ in result]
+        elapsed = time.perf_counter() - start
+        counts = collections.Counter(statuses)
+        print(f"{label}: {len(statuses)} requests in {elapsed:.2f}s = {len(statuses) / elapsed:,.0f} req/s "
+              f"(statuses {dict(counts)})")
+
+def load_test(paths=None, requests=2000, concurrency=8, cache_bytes=CACHE_BYTES):
+    """Measure warm-cache throughput against an in-process threaded server."""
+    server = make_server(port=0, cache_bytes=cache_bytes, verbose=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        measure_throughput(*server.server_address[:2], paths, requests, concurrency)
+        print(f"cache: {server.cache.stats()}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve comedian sprites rendered on request.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-mb", type=float, default=CACHE_BYTES / 2**20,
+                        help="memory for cached PNGs in MiB")
+    parser.add_argument("--load-test", action="store_true",
+                        help="measure warm-cache throughput against an in-process server and exit")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per load test phase")
+    parser.add_argument("--concurrency", type=int, default=8, help="load test client threads")
+    args = parser.parse_args()
+
+    cache_bytes = int(args.cache_mb * 2**20)
+    if args.load_test:
+        load_test(requests=args.requests, concurrency=args.concurrency, cache_bytes=cache_bytes)
+    else:
+        server = make_server(args.host, args.port, cache_bytes)
+        print(f"Serving sprites on http://{args.host}:{server.server_address[1]}/ "
+              f"(e.g. /sprites/talking/1.png?palette=tuxedo&scale=2)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
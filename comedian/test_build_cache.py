@@ -0,0 +1,73 @@
+import artCreator as art
+
+# Incremental builds: the manifest records an input hash per output, and a
+# build skips outputs whose hash is unchanged.
+
+class RecordingSink(art.MemorySink):
+    """MemorySink that remembers which images each build wrote."""
+
+    def __init__(self):
+        super().__init__()
+        self.written = []
+
+    def write_image(self, filename, canvas):
+        self.written.append(filename)
+        super().write_image(filename, canvas)
+
+def build(sink, **options):
+    sink.written = []
+    art.generate_all_assets(sink=sink, verbose=False, **options)
+    return set(sink.written)
+
+def character_frames(sink):
+    return {filename for filename in sink.files if filename.startswith("comedian_") and filename.endswith(".png")
+            and not filename.startswith(art.ATLAS_NAME)}
+
+def test_unchanged_build_writes_nothing():
+    sink = RecordingSink()
+    first = build(sink)
+    assert "curtain.png" in first and character_frames(sink) <= first
+    assert build(sink) == set()
+    assert art.MANIFEST_FILE in sink.files
+
+def test_force_rebuilds_everything():
+    sink = RecordingSink()
+    first = build(sink)
+    assert build(sink, force=True) == first
+
+def test_missing_output_is_rebuilt():
+    sink = RecordingSink()
+    build(sink)
+    del sink.files["comedian_talking_2.png"]
+    assert build(sink) == {"comedian_talking_2.png"}
+
+def test_palette_change_rebuilds():
+    sink = RecordingSink()
+    build(sink)
+    with art.use_palette("tuxedo"):
+        rebuilt = build(sink)
+    assert character_frames(sink) <= rebuilt
+
+def test_source_change_rebuilds_only_dependent_outputs(monkeypatch):
+    sink = RecordingSink()
+    build(sink)
+    own_source = art._own_source
+    # Pretend draw_ellipse was edited: only frames drawn through it change
+    monkeypatch.setattr(art, "_own_source",
+                        lambda func: own_source(func) + ("# edited" if func is art.draw_ellipse else ""))
+    art.source_fingerprint.cache_clear()
+    try:
+        rebuilt = build(sink)
+    finally:
+        monkeypatch.undo()
+        art.source_fingerprint.cache_clear()
+    assert character_frames(sink) <= rebuilt
+    assert "curtain.png" not in rebuilt
+    # Restoring the original source rebuilds the same outputs back
+    assert build(sink) == rebuilt
+
+def test_input_hash_depends_on_parameters_and_encoding():
+    assert art.input_hash(art.render_rig_frame, ("talking", 0)) == art.input_hash(art.render_rig_frame, ("talking", 0))
+    assert art.input_hash(art.render_rig_frame, ("talking", 0)) != art.input_hash(art.render_rig_frame, ("talking", 1))
+    assert (art.input_hash(art.render_rig_frame, ("talking", 0), {"compress_level": 1})
+            != art.input_hash(art.render_rig_frame, ("talking", 0), {"compress_level": 9}))
@@ -0,0 +1,61 @@
+import numpy as np
+
+import artCreator as art
+
+# DedupeSink over a MemorySink: duplicate frames become aliases of the
+# stored frame, and rewriting a stored frame hands its old pixels to one
+# of its aliases first.
+
+def frame(value, size=16):
+    canvas = art.create_blank_canvas(size, size)
+    art.draw_rectangle(canvas, 2, 2, 12, 12, (value, 40, 80, 255))
+    return canvas
+
+def test_identical_frames_are_aliased():
+    memory = art.MemorySink()
+    sink = art.DedupeSink(memory)
+    sink.write_images([("a.png", frame(10)), ("b.png", frame(10)), ("c.png", frame(200))])
+    assert set(memory.files) == {"a.png", "c.png"}
+    assert sink.aliases == {"b.png": "a.png"}
+    assert sink.exists("b.png")
+    assert np.array_equal(sink.read_image("b.png"), frame(10))
+
+def test_aliases_survive_reopening():
+    memory = art.MemorySink()
+    sink = art.DedupeSink(memory)
+    sink.write_images([("a.png", frame(10)), ("b.png", frame(10))])
+    sink.close()
+    assert memory.files[art.ALIASES_FILE]["aliases"] == {"b.png": "a.png"}
+    assert art.DedupeSink(memory).resolve("b.png") == "a.png"
+
+def test_rewriting_a_stored_frame_writes_the_keeper():
+    memory = art.MemorySink()
+    sink = art.DedupeSink(memory)
+    sink.write_images([("a.png", frame(10)), ("b.png", frame(10)), ("c.png", frame(10))])
+    sink.write_image("a.png", frame(99))
+    # b.png keeps a.png's old pixels and c.png now aliases it
+    assert np.array_equal(memory.files["b.png"], frame(10))
+    assert np.array_equal(memory.files["a.png"], frame(99))
+    assert sink.aliases == {"c.png": "b.png"}
+    assert np.array_equal(sink.read_image("c.png"), frame(10))
+
+def test_rewriting_an_alias_detaches_it():
+    memory = art.MemorySink()
+    sink = art.DedupeSink(memory)
+    sink.write_images([("a.png", frame(10)), ("b.png", frame(10))])
+    sink.write_image("b.png", frame(99))
+    assert sink.aliases == {}
+    assert np.array_equal(memory.files["b.png"], frame(99))
+    assert np.array_equal(memory.files["a.png"], frame(10))
+
+def test_tolerance_aliases_noise_jitter_only():
+    base = frame(100)
+    jittered = base.copy()
+    jittered[5, 5, 0] += 30  # An isolated speckle, like texture noise
+    moved = base.copy()
+    moved[4:8, 4:8, :3] = 0  # A whole changed block, like a moved limb
+    memory = art.MemorySink()
+    sink = art.DedupeSink(memory, tolerance=art.DEDUPE_TOLERANCE)
+    sink.write_images([("a.png", base), ("b.png", jittered), ("c.png", moved)])
+    assert sink.aliases == {"b.png": "a.png"}
+    assert set(memory.files) == {"a.png", "c.png"}
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import artCreator as art
+
+# optimize() culls and merges display list commands; running the optimized
+# list must give exactly the pixels of the full one.
+
+CASES = 300
+SIZE = 48
+COLORS = ("blue", "blue_dark", "red", (10, 200, 30, 255))
+
+def random_command(display, rng):
+    def coord():
+        return int(rng.integers(-12, SIZE + 12))
+
+    color = COLORS[rng.integers(len(COLORS))]
+    kind = rng.integers(8)
+    if kind < 3:
+        display.rect(coord(), coord(), int(rng.integers(-2, 30)), int(rng.integers(-2, 30)), color)
+    elif kind == 3:
+        display.circle(coord(), coord(), int(rng.integers(0, 12)), color)
+    elif kind == 4:
+        display.ellipse(coord(), coord(), int(rng.integers(0, 12)), int(rng.integers(0, 12)), color)
+    elif kind == 5:
+        display.line(coord(), coord(), coord(), coord(), color)
+    elif kind == 6:
+        points = [(float(rng.uniform(-10, SIZE + 10)), float(rng.uniform(-10, SIZE + 10))) for _ in range(4)]
+        display.polygon(points, color, antialias=bool(rng.integers(2)))
+    else:
+        display.blit("bow_tie", coord(), coord(), int(rng.integers(6, 16)))
+
+def render(commands, scale):
+    canvas = art.create_blank_canvas(SIZE * scale, SIZE * scale)
+    art.execute(commands, canvas, scale)
+    return canvas
+
+@pytest.mark.parametrize("scale", [1, 2])
+def test_optimize_keeps_pixels_of_random_lists(scale):
+    rng = np.random.default_rng(scale)
+    for case in range(CASES):
+        display = art.DisplayList()
+        for _ in range(rng.integers(1, 12)):
+            random_command(display, rng)
+        optimized = art.optimize(display.commands, SIZE, SIZE)
+        assert len(optimized) <= len(display)
+        assert np.array_equal(render(optimized, scale), render(display.commands, scale)), display.to_json()
+
+def test_optimize_culls_covered_and_merges_adjacent_rects():
+    display = art.DisplayList()
+    display.circle(10, 10, 4, "red")
+    display.rect(0, 0, 20, 20, "blue")
+    display.rect(20, 0, 10, 20, "blue")
+    display.rect(-5, 40, 100, 100, "blue_dark")
+    assert art.optimize(display.commands, SIZE, SIZE) == [("rect", "blue", 0, 0, 30, 20),
+                                                          ("rect", "blue_dark", 0, 40, SIZE, SIZE - 40)]
+
+@pytest.mark.parametrize("animation", ["pacing_right", "talking", "laughing"])
+def test_optimize_keeps_pixels_of_rig_poses(animation):
+    rig = art.load_rig()
+    for pose in art.compile_animation(rig, animation):
+        commands = art.pose_display_list(rig, pose).commands
+        optimized = art.optimize(commands, art.CHAR_SIZE, art.CHAR_SIZE)
+        for scale in (1, 2):
+            expected = art.create_blank_canvas(art.CHAR_SIZE * scale, art.CHAR_SIZE * scale)
+            actual = expected.copy()
+            art.execute(commands, expected, scale)
+            art.execute(optimized, actual, scale)
+            assert np.array_equal(actual, expected)
+
+def test_json_round_trip():
+    rig = art.load_rig()
+    display = art.pose_display_list(rig, art.compile_animation(rig, "talking")[0])
+    copy = art.DisplayList.from_json(display.to_json())
+    assert copy == display and copy.digest() == display.digest() and display.diff(copy) == []
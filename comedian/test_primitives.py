@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+import artCreator as art
+
+# Parity of the vectorised draw_* primitives with the per-pixel draw_pixel
+# loops they replaced. Random shapes include negative coordinates, shapes
+# clipped by every canvas edge and empty (zero or negative size) shapes.
+
+CASES = 500
+CANVAS_SIZE = (40, 56)  # height, width
+
+# =========================
+# PER-PIXEL REFERENCES
+# =========================
+
+def reference_rectangle(canvas, x, y, width, height, color):
+    for i in range(height):
+        for j in range(width):
+            art.draw_pixel(canvas, x + j, y + i, color)
+
+def reference_circle(canvas, center_x, center_y, radius, color):
+    for y in range(center_y - radius, center_y + radius + 1):
+        for x in range(center_x - radius, center_x + radius + 1):
+            if (x - center_x)**2 + (y - center_y)**2 <= radius**2:
+                art.draw_pixel(canvas, x, y, color)
+
+def reference_ellipse(canvas, center_x, center_y, radius_x, radius_y, color):
+    for y in range(center_y - radius_y, center_y + radius_y + 1):
+        for x in range(center_x - radius_x, center_x + radius_x + 1):
+            if (x - center_x)**2 * radius_y**2 + (y - center_y)**2 * radius_x**2 <= (radius_x * radius_y)**2:
+                art.draw_pixel(canvas, x, y, color)
+
+def reference_line(canvas, x1, y1, x2, y2, color):
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx - dy
+    while True:
+        art.draw_pixel(canvas, x1, y1, color)
+        if x1 == x2 and y1 == y2:
+            break
+        e2 = 2 * err
+        if e2 > -dy:
+            err -= dy
+            x1 += sx
+        if e2 < dx:
+            err += dx
+            y1 += sy
+
+def reference_bow_tie(canvas, x, y, size=10):
+    reference_rectangle(canvas, x - size//6, y - size//6, size//3, size//3, art.colors["red_dark"])
+    for i in range(size//2):
+        for j in range(size//3):
+            if (i - size//4)**2 + (j - size//6)**2 <= (size//3)**2:
+                color = art.colors["red_dark"] if i < size//6 else art.colors["red"]
+                art.draw_pixel(canvas, x - size//2 - i, y - size//6 + j, color)
+    for i in range(size//2):
+        for j in range(size//3):
+            if (i - size//4)**2 + (j - size//6)**2 <= (size//3)**2:
+                color = art.colors["red_light"] if i > size//3 else art.colors["red"]
+                art.draw_pixel(canvas, x + size//2 + i - size//2, y - size//6 + j, color)
+
+# =========================
+# PARITY TESTS
+# =========================
+
+def random_color(rng):
+    return tuple(int(value) for value in rng.integers(0, 256, 4))
+
+def assert_parity(draw, reference, args):
+    expected = art.create_blank_canvas(CANVAS_SIZE[1], CANVAS_SIZE[0])
+    actual = expected.copy()
+    reference(expected, *args)
+    draw(actual, *args)
+    assert np.array_equal(actual, expected), args
+
+def test_rectangle_parity():
+    rng = np.random.default_rng(1)
+    for _ in range(CASES):
+        args = (*rng.integers(-20, 70, 2).tolist(), *rng.integers(-3, 40, 2).tolist(), random_color(rng))
+        assert_parity(art.draw_rectangle, reference_rectangle, args)
+
+def test_circle_parity():
+    rng = np.random.default_rng(2)
+    for _ in range(CASES):
+        args = (*rng.integers(-20, 70, 2).tolist(), int(rng.integers(-2, 25)), random_color(rng))
+        assert_parity(art.draw_circle, reference_circle, args)
+
+def test_ellipse_parity():
+    rng = np.random.default_rng(3)
+    for _ in range(CASES):
+        args = (*rng.integers(-20, 70, 2).tolist(), *rng.integers(0, 25, 2).tolist(), random_color(rng))
+        assert_parity(art.draw_ellipse, reference_ellipse, args)
+
+def test_line_parity():
+    rng = np.random.default_rng(4)
+    for _ in range(CASES):
+        args = (*rng.integers(-30, 80, 4).tolist(), random_color(rng))
+        assert_parity(art.draw_line, reference_line, args)
+
+def test_bow_tie_parity():
+    rng = np.random.default_rng(5)
+    for _ in range(CASES):
+        args = (*rng.integers(-20, 70, 2).tolist(), int(rng.integers(0, 40)))
+        assert_parity(art.draw_bow_tie, reference_bow_tie, args)
+
+@pytest.mark.parametrize("scale", [2, 3, 4])
+def test_scaled_rectangle_is_upscaled_base(scale):
+    rng = np.random.default_rng(scale)
+    for _ in range(CASES // 5):
+        x, y = rng.integers(-20, 70, 2).tolist()
+        width, height = rng.integers(-3, 40, 2).tolist()
+        base = art.create_blank_canvas(CANVAS_SIZE[1], CANVAS_SIZE[0])
+        scaled = art.create_blank_canvas(CANVAS_SIZE[1] * scale, CANVAS_SIZE[0] * scale)
+        art.draw_rectangle(base, x, y, width, height, art.colors["blue"])
+        art.draw_rectangle(scaled, x, y, width, height, art.colors["blue"], scale=scale)
+        assert np.array_equal(scaled, art.upscale_nearest(base, scale))
@@ -0,0 +1,109 @@
+import http.client
+import threading
+
+import pytest
+
+import artCreator as art
+import spriteServer as sprites
+
+# =========================
+# FRAME CACHE
+# =========================
+
+def test_frame_cache_evicts_asset_cache_entries():
+    # AssetCache stores (body, etag, fresh_until) entries
+    cache = sprites.FrameCache(max_bytes=250)
+    for index in range(10):
+        cache.put(index, (bytes(100), f'"{index}"', 0.0))
+        assert cache.size <= cache.max_bytes
+    assert list(cache.entries) == [8, 9]
+    assert cache.size == sum(len(body) for body, _, _ in cache.entries.values())
+
+def test_frame_cache_evicts_least_recently_used():
+    cache = sprites.FrameCache(max_bytes=300)
+    for index in range(3):
+        cache.put(index, (bytes(100), f'"{index}"'))
+    cache.get(0)
+    cache.put(3, (bytes(100), '"3"'))
+    assert list(cache.entries) == [2, 0, 3]
+    assert cache.size == 300
+
+def test_frame_cache_skips_oversized_entries():
+    cache = sprites.FrameCache(max_bytes=50)
+    cache.put("big", (bytes(51), '"big"', 0.0))
+    assert cache.get("big") is None
+    assert cache.size == 0
+
+# =========================
+# ASSET KEYS AND ETAGS
+# =========================
+
+@pytest.mark.parametrize("url", [
+    "/sprites/talking/1.png?palette=plaid",
+    "/sprites/talking/1.png?scale=0",
+    f"/sprites/talking/1.png?scale={sprites.MAX_SCALE + 1}",
+    "/sprites/talking/1.png?scale=two",
+    "/sprites/talking/1.png?mode=blurry",
+    "/sprites/talking/1.png?seed=-1",
+    f"/sprites/talking/1.png?seed={sprites.MAX_SEED + 1}",
+])
+def test_bad_query_parameters_are_value_errors(url):
+    with pytest.raises(ValueError):
+        sprites.parse_asset_key(url)
+
+@pytest.mark.parametrize("url", [
+    "/sprites/talking/0.png",
+    "/sprites/talking/99.png",
+    "/sprites/juggling/1.png",
+    "/sprites/talking/1.gif",
+    "/curtain/middle.png",
+    "/faces/talking/up.png",
+    "/faces/talking.png",
+])
+def test_unknown_paths_are_lookup_errors(url):
+    with pytest.raises(LookupError):
+        sprites.parse_asset_key(url)
+
+def test_asset_keys():
+    assert (sprites.parse_asset_key("/sprites/talking/3.png?palette=tuxedo&scale=2&mode=vector&seed=7")
+            == ("sprite", "talking", 3, "tuxedo", 2, "vector", 7))
+    assert sprites.parse_asset_key("/curtain/full.png") == (
+        "curtain", "full", 0, "classic", art.SCALE, art.SCALE_MODE, art.NOISE_SEED)
+    assert sprites.parse_asset_key("/faces/laughing/left.png")[:3] == ("face", "laughing", "left")
+
+def test_etag_matches():
+    assert not sprites.etag_matches(None, '"abc"')
+    assert sprites.etag_matches('"abc"', '"abc"')
+    assert sprites.etag_matches('W/"abc"', '"abc"')
+    assert sprites.etag_matches('"x", W/"abc" , "y"', '"abc"')
+    assert sprites.etag_matches(" * ", '"abc"')
+    assert not sprites.etag_matches('"abd"', '"abc"')
+    assert not sprites.etag_matches('abc', '"abc"')
+
+def test_handler_status_codes(monkeypatch):
+    server = sprites.make_server(port=0, verbose=False)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection(*server.server_address[:2])
+
+        def status(path, headers=None):
+            connection.request("GET", path, headers=headers or {})
+            response = connection.getresponse()
+            response.read()
+            return response.status, response.getheader("ETag")
+
+        assert status("/sprites/talking/1.png?seed=-1")[0] == 400
+        assert status("/sprites/nothing/1.png")[0] == 404
+        code, etag = status("/sprites/talking/1.png")
+        assert code == 200
+        assert status("/sprites/talking/1.png", {"If-None-Match": f"W/{etag}"})[0] == 304
+
+        def fail(key):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(sprites, "render_png", fail)
+        assert status("/sprites/talking/2.png")[0] == 500
+    finally:
+        server.shutdown()
+        server.server_close()